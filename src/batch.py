@@ -0,0 +1,306 @@
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from exporter import ParameterExporter
+from flame_cache import load_flame_model
+from frame_source import FrameSource
+from main import FLAME_PATH, MAPPINGS_PATH, MODEL_PATH, create_detector, export_video
+from npy_writer import NpyAppendWriter
+from translator import FlameTranslator
+
+VIDEO_EXTENSIONS = ('.mp4', '.mov', '.avi', '.mkv', '.webm')
+DONE_MARKER = 'done.json'
+FAILED_REPORT = 'failed.json'
+
+# Per-process state created once by _init_worker
+_worker = {}
+
+
+def find_videos(source):
+    """
+    List input videos from a directory (searched recursively) or a manifest
+    file with one path per line (blank lines and # comments are ignored).
+    """
+    if os.path.isdir(source):
+        videos = []
+        for root, _, files in os.walk(source):
+            videos.extend(os.path.join(root, name) for name in files
+                          if name.lower().endswith(VIDEO_EXTENSIONS))
+        return sorted(videos)
+
+    base_dir = os.path.dirname(os.path.abspath(source))
+    with open(source) as f:
+        lines = [line.strip() for line in f]
+    return [os.path.join(base_dir, line) for line in lines if line and not line.startswith('#')]
+
+
+def is_complete(output_dir):
+    return os.path.exists(os.path.join(output_dir, DONE_MARKER))
+
+
+def _finish(tmp_dir, output_dir, info):
+    """Mark a finished output and move it into place in one rename."""
+    with open(os.path.join(tmp_dir, DONE_MARKER), 'w') as f:
+        json.dump(info, f, indent=2)
+    shutil.rmtree(output_dir, ignore_errors=True)
+    os.replace(tmp_dir, output_dir)
+
+
+def _init_worker(model_path, flame_path, mappings_path):
+    # A Pool replaces a worker whose initializer raises, forever (e.g. with
+    # a bad model path), so the error is kept for _process_task to report
+    try:
+        # float32 lets every worker use the memory-mapped FLAME cache
+        # directly, so the basis pages are shared read-only across the pool
+        _worker['translator'] = FlameTranslator(flame_path, mappings_path=mappings_path, dtype=np.float32)
+        _worker['detector'] = create_detector(model_path)
+        _worker['clock'] = 0
+    except Exception as e:
+        _worker['error'] = f"Worker setup failed: {type(e).__name__}: {e}"
+
+
+def _process_task(task):
+    """
+    Export one video or one segment of a video. Runs inside a pool worker.
+
+    Returns (task, frame_count, error). A failing task returns its error
+    message instead of raising, so one bad video cannot stop the pool.
+    Every task of a worker that could not be set up fails with its error.
+    """
+    if 'error' in _worker:
+        return task, 0, _worker['error']
+    try:
+        return task, _export_task(task), None
+    except Exception as e:
+        shutil.rmtree(task['output'] + '.tmp', ignore_errors=True)
+        return task, 0, f"{type(e).__name__}: {e}"
+
+
+def _export_task(task):
+    translator = _worker['translator']
+    cap = cv2.VideoCapture(task['video'])
+    if not cap.isOpened():
+        raise IOError(f"Cannot open video: {task['video']}")
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    if task['first_frame']:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, task['first_frame'])
+
+    frame_source = FrameSource(cap, detect_size=task['detect_size'], stride=task['frame_stride'],
+                               first_frame=task['first_frame'])
+
+    tmp_dir = task['output'] + '.tmp'
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    start_time = time.perf_counter()
+    try:
+        with ParameterExporter(tmp_dir, save_vertices=task['vertices'],
+                               num_vertices=translator.v_template.shape[0]) as exporter:
+            frame_count = export_video(cap, _worker['detector'], translator, exporter, fps,
+                                       first_frame=task['first_frame'], num_frames=task['num_frames'],
+                                       detector_clock=_worker['clock'], frame_source=frame_source,
+                                       progress_every=0)
+    finally:
+        cap.release()
+        # The landmarker is reused across tasks and needs increasing
+        # timestamps, also after a task that failed part-way
+        _worker['clock'] += int(1000 * (frame_source.index + 1) / fps) + 1
+    elapsed = time.perf_counter() - start_time
+
+    _finish(tmp_dir, task['output'], {
+        'video': task['video'], 'first_frame': task['first_frame'],
+        'frames': frame_count, 'frame_stride': task['frame_stride'], 'fps': fps, 'seconds': elapsed,
+    })
+    return frame_count
+
+
+def stitch_segments(part_dirs, output_dir, chunk_size=1024):
+    """Concatenate per-segment .npy outputs in order into output_dir."""
+    tmp_dir = output_dir + '.tmp'
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    names = sorted(name for name in os.listdir(part_dirs[0]) if name.endswith('.npy'))
+    for name in names:
+        first = np.load(os.path.join(part_dirs[0], name), mmap_mode='r')
+        with NpyAppendWriter(os.path.join(tmp_dir, name), first.shape[1:], first.dtype) as writer:
+            for part_dir in part_dirs:
+                part = np.load(os.path.join(part_dir, name), mmap_mode='r')
+                for start in range(0, len(part), chunk_size):
+                    writer.extend(part[start:start + chunk_size])
+
+    infos = []
+    for part_dir in part_dirs:
+        with open(os.path.join(part_dir, DONE_MARKER)) as f:
+            infos.append(json.load(f))
+    _finish(tmp_dir, output_dir, {
+        'video': infos[0]['video'], 'first_frame': 0,
+        'frames': sum(info['frames'] for info in infos), 'frame_stride': infos[0].get('frame_stride', 1),
+        'fps': infos[0]['fps'],
+        'segments': len(infos), 'seconds': sum(info['seconds'] for info in infos),
+    })
+
+
+def plan_tasks(videos, output_root, segment_seconds=None, save_vertices=False, frame_stride=1,
+               detect_size=None):
+    """
+    Build the task list, skipping outputs that are already complete.
+
+    Segments span a multiple of frame_stride frames, so a segmented video
+    samples the same frames as an unsegmented one.
+
+    Returns (tasks, segments) where segments maps each segmented video's
+    final output directory to its ordered list of part directories.
+    """
+    tasks = []
+    segments = {}
+    seen = set()
+    for video in videos:
+        name = os.path.splitext(os.path.basename(video))[0]
+        if name in seen:
+            raise ValueError(f"Duplicate video name in batch: {name}")
+        seen.add(name)
+
+        output_dir = os.path.join(output_root, name)
+        if is_complete(output_dir):
+            continue
+
+        ranges = [(0, None)]
+        if segment_seconds:
+            cap = cv2.VideoCapture(video)
+            fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+            total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            cap.release()
+            step = max(1, int(segment_seconds * fps))
+            step = -(-step // frame_stride) * frame_stride
+            starts = list(range(0, max(total_frames, 1), step))
+            # The last segment runs to the end, as frame counts can be approximate
+            ranges = [(start, step) for start in starts[:-1]] + [(starts[-1], None)]
+
+        options = {'vertices': save_vertices, 'frame_stride': frame_stride, 'detect_size': detect_size}
+        if len(ranges) == 1:
+            tasks.append({'video': video, 'output': output_dir, 'first_frame': 0,
+                          'num_frames': None, 'segment_of': None, **options})
+            continue
+
+        part_dirs = []
+        for index, (first_frame, num_frames) in enumerate(ranges):
+            part_dir = os.path.join(output_root, name + '.parts', f'{index:04d}')
+            part_dirs.append(part_dir)
+            if not is_complete(part_dir):
+                tasks.append({'video': video, 'output': part_dir, 'first_frame': first_frame,
+                              'num_frames': num_frames, 'segment_of': output_dir, **options})
+        segments[output_dir] = part_dirs
+    return tasks, segments
+
+
+def run_batch(videos, output_root, workers=None, segment_seconds=None, save_vertices=False,
+              frame_stride=1, detect_size=None,
+              model_path=MODEL_PATH, flame_path=FLAME_PATH, mappings_path=MAPPINGS_PATH):
+    """
+    Export FLAME parameters for many videos over a process pool.
+
+    Each worker creates its own FaceLandmarker. Completed outputs are
+    skipped, so an interrupted batch resumes where it stopped. With
+    segment_seconds, long videos are split into time segments processed in
+    parallel and stitched back in order. frame_stride samples every n-th
+    frame and detect_size downscales large frames before detection.
+
+    Videos that fail are skipped and listed in output_root/failed.json;
+    the rest of the batch still runs.
+
+    Returns:
+        (total_frames, failed): failed lists {'video', 'output', 'error'}
+        for every failed task
+    """
+    os.makedirs(output_root, exist_ok=True)
+    # Build the FLAME cache once up front so workers only memory-map it
+    load_flame_model(flame_path)
+
+    tasks, segments = plan_tasks(videos, output_root, segment_seconds, save_vertices,
+                                 frame_stride=frame_stride, detect_size=detect_size)
+    skipped = len(videos) - len({task['video'] for task in tasks})
+    print(f"{len(tasks)} tasks from {len(videos)} videos ({skipped} already complete)")
+
+    def stitch_if_ready(output_dir):
+        part_dirs = segments[output_dir]
+        if all(is_complete(part_dir) for part_dir in part_dirs):
+            stitch_segments(part_dirs, output_dir)
+            shutil.rmtree(os.path.dirname(part_dirs[0]), ignore_errors=True)
+            print(f"✓ Stitched {len(part_dirs)} segments -> {output_dir}")
+
+    total_frames = 0
+    failed = []
+    start_time = time.perf_counter()
+    if tasks:
+        with multiprocessing.Pool(workers, initializer=_init_worker,
+                                  initargs=(model_path, flame_path, mappings_path)) as pool:
+            results = pool.imap_unordered(_process_task, tasks)
+            for done, (task, frame_count, error) in enumerate(results, 1):
+                if error is not None:
+                    failed.append({'video': task['video'], 'output': task['output'], 'error': error})
+                    print(f"[{done}/{len(tasks)}] ✗ {task['output']}: {error}")
+                    continue
+                total_frames += frame_count
+                elapsed = time.perf_counter() - start_time
+                print(f"[{done}/{len(tasks)}] {task['output']}: {frame_count} frames "
+                      f"(aggregate {total_frames / elapsed:.1f} FPS)")
+
+                if task['segment_of']:
+                    stitch_if_ready(task['segment_of'])
+
+    # Segments finished by an earlier, interrupted run may still need stitching
+    for output_dir in segments:
+        if not is_complete(output_dir):
+            stitch_if_ready(output_dir)
+
+    elapsed = time.perf_counter() - start_time
+    fps = total_frames / elapsed if elapsed > 0 else 0.0
+    print(f"\n=== Batch finished: {total_frames} frames in {elapsed:.1f}s ({fps:.1f} FPS aggregate) ===")
+
+    report_path = os.path.join(output_root, FAILED_REPORT)
+    if failed:
+        with open(report_path, 'w') as f:
+            json.dump(failed, f, indent=2)
+        videos_failed = sorted({entry['video'] for entry in failed})
+        print(f"✗ {len(videos_failed)} videos failed ({len(failed)} tasks), see {report_path}:")
+        for video in videos_failed:
+            print(f"  {video}")
+    elif os.path.exists(report_path):
+        os.remove(report_path)
+    return total_frames, failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export FLAME parameters for many videos in parallel.")
+    parser.add_argument('source', help="Directory of videos or a manifest file with one path per line")
+    parser.add_argument('--output', default='output', help="Root directory for per-video outputs")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument('--segment-seconds', type=float, default=None,
+                        help="Split each video into segments of this length across workers")
+    parser.add_argument('--vertices', action='store_true', help="Also write vertices.npy per video")
+    parser.add_argument('--frame-stride', type=int, default=1, metavar='N',
+                        help="Process every N-th frame only")
+    parser.add_argument('--detect-size', type=int, default=None, metavar='PIXELS',
+                        help="Downscale frames more than 4x larger to this longest side before detection")
+    parser.add_argument('--model', default=MODEL_PATH, help="MediaPipe face_landmarker.task")
+    parser.add_argument('--flame', default=FLAME_PATH, help="FLAME generic_model.pkl")
+    parser.add_argument('--mappings', default=MAPPINGS_PATH, help="Folder with mapping .npy files")
+    args = parser.parse_args(argv)
+
+    _, failed = run_batch(find_videos(args.source), args.output, workers=args.workers,
+                          segment_seconds=args.segment_seconds, save_vertices=args.vertices,
+                          frame_stride=args.frame_stride, detect_size=args.detect_size,
+                          model_path=args.model, flame_path=args.flame, mappings_path=args.mappings)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,424 @@
+import argparse
+import contextlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+from filters import create_filter
+from frame_source import FrameSource
+from head_pose import HeadPoseSolver, head_rotation, rotation_matrices
+from param_stream import ParameterDecoder, ParameterEncoder
+from translator import BLENDSHAPE_NAMES, FlameTranslator
+
+REPO_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+MAPPINGS_PATH = os.path.join(REPO_ROOT, 'mappings')
+
+# FLAME 2020 dimensions
+NUM_VERTICES = 5023
+NUM_FACES = 9976
+NUM_EXPRESSIONS = 100
+NUM_JOINTS = 5
+
+# Source resolutions for the input-stage cases, and the detection size used
+INPUT_RESOLUTIONS = {'720p': (1280, 720), '1080p': (1920, 1080), '4k': (3840, 2160)}
+DETECT_SIZE = 640
+
+
+class SyntheticCategory:
+    """Stand-in for mediapipe's Category with the fields the translator reads."""
+
+    __slots__ = ('index', 'score', 'display_name', 'category_name')
+
+    def __init__(self, index, score, category_name):
+        self.index = index
+        self.score = score
+        self.display_name = ''
+        self.category_name = category_name
+
+
+class SyntheticCapture:
+    """Stand-in for cv2.VideoCapture that decodes one fixed BGR frame forever."""
+
+    def __init__(self, width, height, seed=0):
+        self.frame = np.random.default_rng(seed).integers(0, 256, (height, width, 3), dtype=np.uint8)
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return self.frame.shape[1]
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return self.frame.shape[0]
+        return 0.0
+
+    def read(self, image=None):
+        if image is None:
+            return True, self.frame.copy()
+        np.copyto(image, self.frame)
+        return True, image
+
+    def grab(self):
+        return True
+
+
+def localized_basis(v_template, seed=0, region_fraction=0.08):
+    """
+    Expression basis where every component only moves a local patch of the
+    mesh (the region_fraction of vertices nearest a random centre, with a
+    smooth falloff), like FLAME's mouth, eye and brow components.
+    """
+    rng = np.random.default_rng(seed)
+    num_vertices = len(v_template)
+    region_size = int(region_fraction * num_vertices)
+    basis = np.zeros((num_vertices, 3, NUM_EXPRESSIONS), dtype=np.float32)
+    for component in range(NUM_EXPRESSIONS):
+        distance = np.linalg.norm(v_template - v_template[rng.integers(num_vertices)], axis=1)
+        region = np.argsort(distance)[:region_size]
+        falloff = 1.0 - distance[region] / distance[region].max()
+        basis[region, :, component] = falloff[:, None] * rng.standard_normal(3) * 1e-3
+    return basis.reshape(-1, NUM_EXPRESSIONS)
+
+
+def synthetic_model(seed=0, localized=False):
+    """
+    FLAME-shaped random model (same array shapes and dtypes as the cache),
+    so benchmarks run without the licensed generic_model.pkl. With
+    localized=True the expression basis is region-sparse (localized_basis).
+    """
+    rng = np.random.default_rng(seed)
+
+    # Roughly FLAME-like skinning: a quarter of the vertices follow the jaw,
+    # a few dozen each follow an eye, the rest the neck
+    weights = np.zeros((NUM_VERTICES, NUM_JOINTS), dtype=np.float32)
+    region = rng.permutation(NUM_VERTICES)
+    jaw, eye_l, eye_r = region[:NUM_VERTICES // 4], region[-100:-50], region[-50:]
+    weights[:, 1] = 1.0
+    weights[jaw, 1] = 0.3
+    weights[jaw, 2] = 0.7
+    weights[np.r_[eye_l, eye_r], 1] = 0.0
+    weights[eye_l, 3] = 1.0
+    weights[eye_r, 4] = 1.0
+
+    J_regressor = np.zeros((NUM_JOINTS, NUM_VERTICES), dtype=np.float32)
+    for joint, members in enumerate([region, region, jaw, eye_l, eye_r]):
+        J_regressor[joint, members] = 1.0 / len(members)
+
+    v_template = (rng.standard_normal((NUM_VERTICES, 3)) * 0.05).astype(np.float32)
+    expression_basis = (rng.standard_normal((NUM_VERTICES * 3, NUM_EXPRESSIONS)) * 1e-3).astype(np.float32)
+    if localized:
+        expression_basis = localized_basis(v_template, seed)
+
+    return {
+        'v_template': v_template,
+        'expression_basis': expression_basis,
+        'f': rng.integers(0, NUM_VERTICES, size=(NUM_FACES, 3), dtype=np.int32),
+        'J_regressor': J_regressor,
+        'kintree_table': np.array([[-1, 0, 1, 1, 1], [0, 1, 2, 3, 4]], dtype=np.int64),
+        'weights': weights,
+        'posedirs': (rng.standard_normal((NUM_VERTICES * 3, (NUM_JOINTS - 1) * 9)) * 1e-4).astype(np.float32),
+    }
+
+
+def synthetic_scores(num_frames, seed=0):
+    """Smooth random (num_frames, 52) blendshape streams in [0, 1]."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(num_frames)[:, None] / 30.0
+    freqs = rng.uniform(0.1, 2.0, size=len(BLENDSHAPE_NAMES))
+    phases = rng.uniform(0, 2 * np.pi, size=len(BLENDSHAPE_NAMES))
+    scores = 0.5 + 0.5 * np.sin(2 * np.pi * freqs * t + phases)
+    scores += rng.normal(scale=0.02, size=scores.shape)
+    return np.clip(scores, 0.0, 1.0)
+
+
+def synthetic_blendshapes(num_frames, seed=0):
+    """Per-frame lists of 52 categories, as returned in result.face_blendshapes[0]."""
+    return [
+        [SyntheticCategory(i, float(score), name) for i, (name, score) in enumerate(zip(BLENDSHAPE_NAMES, row))]
+        for row in synthetic_scores(num_frames, seed)
+    ]
+
+
+def synthetic_landmarks(num_frames, seed=0, num_landmarks=478):
+    """(num_frames, 478, 3) normalized landmarks of a rigid point cloud turning its head."""
+    rng = np.random.default_rng(seed)
+    face = rng.normal(scale=0.05, size=(num_landmarks, 3))
+    t = np.arange(num_frames)[:, None] / 30.0
+    angles = 0.3 * np.sin(2 * np.pi * np.array([0.3, 0.2, 0.1]) * t)
+    points = np.matmul(face, np.swapaxes(rotation_matrices(angles), 1, 2))
+    # Camera space to MediaPipe image space: y down, z away from the camera
+    points *= np.array([1.0, -1.0, -1.0])
+    points[..., :2] += 0.5
+    return points
+
+
+def talking_head_expressions(num_frames, seed=0, num_speech=12, blink_components=(12, 13)):
+    """
+    (num_frames, 100) expression stream shaped like talking-head footage:
+    num_speech mouth/jaw components move at syllable rate, two blink
+    components fire every few seconds and everything else holds still
+    apart from rare small adjustments.
+    """
+    rng = np.random.default_rng(seed)
+    t = np.arange(num_frames) / 30.0
+    expressions = np.tile(rng.normal(scale=0.5, size=NUM_EXPRESSIONS), (num_frames, 1))
+
+    freqs = rng.uniform(2.0, 6.0, size=num_speech)
+    phases = rng.uniform(0, 2 * np.pi, size=num_speech)
+    expressions[:, :num_speech] += np.sin(2 * np.pi * freqs * t[:, None] + phases)
+
+    blinking = (t % 4.0) < 0.15
+    expressions[blinking, blink_components[0]:blink_components[-1] + 1] += 2.0
+
+    # Occasional expression changes on the remaining components
+    for frame in rng.choice(num_frames, size=num_frames // 30, replace=False):
+        expressions[frame:, rng.integers(num_speech, NUM_EXPRESSIONS)] += rng.normal(scale=0.2)
+    return expressions
+
+
+def measure(fn, inputs, warmup=20, alloc_samples=50):
+    """
+    Time fn(x) for every x in inputs.
+
+    Returns latency percentiles (ms), throughput (calls/s) and the mean
+    number of bytes allocated per call, measured separately under
+    tracemalloc so it does not distort the timings.
+    """
+    for x in inputs[:warmup]:
+        fn(x)
+
+    latencies = np.empty(len(inputs))
+    for i, x in enumerate(inputs):
+        start = time.perf_counter()
+        fn(x)
+        latencies[i] = time.perf_counter() - start
+
+    tracemalloc.start()
+    allocated = 0
+    samples = inputs[:alloc_samples]
+    for x in samples:
+        tracemalloc.reset_peak()
+        before, _ = tracemalloc.get_traced_memory()
+        fn(x)
+        _, peak = tracemalloc.get_traced_memory()
+        allocated += peak - before
+    tracemalloc.stop()
+
+    latencies_ms = latencies * 1000
+    return {
+        'calls': len(inputs),
+        'mean_ms': float(latencies_ms.mean()),
+        'p50_ms': float(np.percentile(latencies_ms, 50)),
+        'p95_ms': float(np.percentile(latencies_ms, 95)),
+        'p99_ms': float(np.percentile(latencies_ms, 99)),
+        'max_ms': float(latencies_ms.max()),
+        'throughput_per_s': float(len(inputs) / latencies.sum()),
+        'alloc_bytes_per_call': allocated / max(len(samples), 1),
+    }
+
+
+def _environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=REPO_ROOT, capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'commit': commit,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'platform': platform.platform(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+
+def run_benchmarks(num_frames=1000, warmup=20, dtype=np.float64, render=True, seed=0):
+    """Run every benchmark case and return the results as a JSON-serialisable dict."""
+    model = synthetic_model(seed)
+    pretrained = FlameTranslator(model, mappings_path=MAPPINGS_PATH, dtype=dtype)
+    fallback = FlameTranslator(model, mappings_path=None, dtype=dtype)
+    if not pretrained.use_pretrained:
+        raise RuntimeError(f"Pre-trained mappings not found in {MAPPINGS_PATH}")
+
+    blendshapes = synthetic_blendshapes(num_frames, seed)
+    expressions = [pretrained.translate(frame)[0].copy() for frame in blendshapes]
+    articulated = [tuple(part.copy() for part in pretrained.translate(frame)) for frame in blendshapes]
+    rng = np.random.default_rng(seed)
+    angles = rng.uniform(-0.5, 0.5, size=(num_frames, 3))
+    rotation = np.empty((3, 3))
+    landmarks = list(synthetic_landmarks(num_frames, seed))
+    landmark_pose = HeadPoseSolver('landmarks')
+    kabsch_pose = HeadPoseSolver('kabsch')
+    deformed = pretrained.deform_mesh(expressions[0]).copy()
+
+    one_euro = create_filter('one_euro')
+    kalman = create_filter('kalman')
+    filter_inputs = [(i / 30.0, params, angles[i]) for i, params in enumerate(articulated)]
+
+    def filter_with(param_filter):
+        return lambda item: param_filter.update(item[0], *item[1], item[2])
+
+    # Parameter streaming: delta packets against the previous frame
+    encoder = ParameterEncoder('float16', delta=True)
+    packets = [bytes(encoder.encode(i * 33, *params, angles[i])) for i, params in enumerate(articulated)]
+    stream_encoder = ParameterEncoder('float16', delta=True)
+    stream_decoder = ParameterDecoder()
+
+    def stream_encode(item):
+        stream_encoder.encode(item[0] * 1000, *item[1], item[2])
+
+    def stream_decode(packet):
+        # measure() replays the inputs: restart from the first keyframe
+        if packet is packets[0]:
+            stream_decoder.frames.clear()
+        stream_decoder.decode(packet)
+
+    def pose(yaw_pitch_roll):
+        head_rotation(yaw_pitch_roll, rotation)
+        pretrained.transform_mesh(deformed, rotation)
+
+    low_rank = FlameTranslator(model, mappings_path=MAPPINGS_PATH, dtype=dtype)
+    low_rank.init_low_rank()
+    truncated = FlameTranslator(model, mappings_path=MAPPINGS_PATH, dtype=dtype)
+    truncated.init_low_rank(rank=16)
+
+    cases = {
+        'mediapipe_to_array': (pretrained.mediapipe_to_array, blendshapes),
+        'translate_pretrained': (pretrained.translate, blendshapes),
+        'translate_fallback': (fallback.translate, blendshapes),
+        'deform_mesh': (pretrained.deform_mesh, expressions),
+        'deform_articulated': (lambda params: pretrained.deform_mesh(*params), articulated),
+        'deform_low_rank': (low_rank.deform_low_rank, expressions),
+        'deform_low_rank_k16': (truncated.deform_low_rank, expressions),
+        'rotate_center': (pose, list(angles)),
+        'head_pose_landmarks': (landmark_pose, landmarks),
+        'head_pose_kabsch': (kabsch_pose, landmarks),
+        'filter_one_euro': (filter_with(one_euro), filter_inputs),
+        'filter_kalman': (filter_with(kalman), filter_inputs),
+        'stream_encode_delta': (stream_encode, filter_inputs),
+        'stream_decode_delta': (stream_decode, packets),
+    }
+
+    if render:
+        try:
+            from visualizer import Visualizer
+            visualizer = Visualizer(model['f'], off_screen=True, num_vertices=NUM_VERTICES)
+        except Exception as e:
+            print(f"⚠ Skipping visualizer benchmark: {e}", file=sys.stderr)
+        else:
+            posed = [pretrained.transform_mesh(deformed, np.eye(3), out=np.empty_like(deformed))
+                     for _ in range(2)]
+
+            def update(i):
+                visualizer.update_mesh(posed[i % 2])
+                visualizer.plotter.render()
+
+            cases['visualizer_update'] = (update, list(range(min(num_frames, 200))))
+
+    # Batched multi-face path: one GEMM and one batched rotation for N faces
+    def multi_face(num_faces):
+        expr = np.stack([expressions[i] for i in range(num_faces)])
+        rotations = np.tile(np.eye(3), (num_faces, 1, 1))
+        deformed_faces = np.empty((num_faces, NUM_VERTICES, 3), dtype=dtype)
+        posed_faces = np.empty_like(deformed_faces)
+
+        def step(_):
+            pretrained.deform_batch(expr, out=deformed_faces)
+            pretrained.transform_batch(deformed_faces, rotations, out=posed_faces)
+        return step, list(range(min(num_frames, 300)))
+
+    for num_faces in (1, 2, 4):
+        cases[f'multi_face_x{num_faces}'] = multi_face(num_faces)
+
+    # Input stage per source resolution: the original full-resolution
+    # conversion into new arrays, against FrameSource's reused buffers with
+    # --detect-size (which only downscales 4K, see DOWNSCALE_MARGIN), and
+    # with a crop around the face
+    face_landmarks = synthetic_landmarks(1, seed)[0]
+
+    def input_cases(width, height):
+        capture = SyntheticCapture(width, height, seed)
+        downscaled = FrameSource(capture, detect_size=DETECT_SIZE)
+        cropped = FrameSource(capture, detect_size=DETECT_SIZE, roi=True)
+        cropped.track(face_landmarks)
+        return {
+            'convert': lambda _: cv2.cvtColor(capture.read()[1], cv2.COLOR_BGR2RGB),
+            'downscale': lambda _: downscaled.detection_frame(downscaled.read()),
+            'roi': lambda _: cropped.detection_frame(cropped.read()),
+        }
+
+    for resolution, (width, height) in INPUT_RESOLUTIONS.items():
+        for variant, fn in input_cases(width, height).items():
+            cases[f'input_{variant}_{resolution}'] = (fn, list(range(min(num_frames, 100))))
+
+    # Talking-head stream on a region-sparse basis: full vs incremental deformation
+    localized = synthetic_model(seed, localized=True)
+    talking = list(talking_head_expressions(num_frames, seed))
+    dense_head = FlameTranslator(localized, mappings_path=None, dtype=dtype)
+    incremental = FlameTranslator(localized, mappings_path=None, dtype=dtype)
+    incremental.init_incremental()
+    region = FlameTranslator(localized, mappings_path=None, dtype=dtype)
+    region.init_incremental(region_tolerance=1e-6)
+    cases['deform_talking_head'] = (dense_head.deform_mesh, talking)
+    cases['deform_incremental'] = (incremental.deform_incremental, talking)
+    cases['deform_incremental_region'] = (region.deform_incremental, talking)
+
+    results = {name: measure(fn, inputs, warmup) for name, (fn, inputs) in cases.items()}
+    return {
+        'environment': _environment(),
+        'config': {'frames': num_frames, 'warmup': warmup, 'dtype': np.dtype(dtype).name, 'seed': seed},
+        'results': results,
+    }
+
+
+def format_results(report, baseline=None):
+    lines = [f"{'case':26s} {'p50 ms':>9s} {'p95 ms':>9s} {'p99 ms':>9s} {'calls/s':>10s} {'alloc B':>10s}"]
+    for name, r in report['results'].items():
+        line = (f"{name:26s} {r['p50_ms']:9.4f} {r['p95_ms']:9.4f} {r['p99_ms']:9.4f} "
+                f"{r['throughput_per_s']:10.0f} {r['alloc_bytes_per_call']:10.0f}")
+        if baseline and name in baseline['results']:
+            change = r['p50_ms'] / baseline['results'][name]['p50_ms'] - 1
+            line += f"  ({change:+.1%} p50 vs baseline)"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the translator and deformation hot paths.")
+    parser.add_argument('--frames', type=int, default=1000, help="Synthetic frames per case")
+    parser.add_argument('--warmup', type=int, default=20, help="Untimed calls before measuring")
+    parser.add_argument('--float32', action='store_true', help="Benchmark the float32 deformation mode")
+    parser.add_argument('--no-render', action='store_true', help="Skip the off-screen Visualizer case")
+    parser.add_argument('--json', metavar='PATH', help="Write results as JSON ('-' for stdout)")
+    parser.add_argument('--compare', metavar='PATH', help="Baseline JSON to compare p50 latencies against")
+    args = parser.parse_args(argv)
+
+    # Keep stdout clean for the JSON when it is the only output
+    log_stream = sys.stderr if args.json == '-' else sys.stdout
+    with contextlib.redirect_stdout(log_stream):
+        report = run_benchmarks(num_frames=args.frames, warmup=args.warmup,
+                                dtype=np.float32 if args.float32 else np.float64,
+                                render=not args.no_render)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    if args.json == '-':
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        print(format_results(report, baseline))
+        if args.json:
+            with open(args.json, 'w') as f:
+                json.dump(report, f, indent=2)
+            print(f"\n✓ Results written to: {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+import os
+
+import cv2
+import numpy as np
+
+from npy_writer import NpyAppendWriter
+
+# Files written by ParameterExporter, one row per source frame
+PARAMETER_FILES = {
+    'timestamps': ((), np.int64),        # milliseconds
+    'valid': ((), np.bool_),             # face detected in this frame
+    'expression': ((100,), np.float32),
+    'jaw_pose': ((3,), np.float32),
+    'eye_pose': ((6,), np.float32),
+    'head_pose': ((3,), np.float32),     # yaw, pitch, roll in radians
+}
+
+
+class ParameterExporter:
+    """
+    Streams per-frame FLAME parameters to a directory of .npy files.
+
+    Every array is appended frame by frame through NpyAppendWriter, so memory
+    stays flat however long the input is, and the outputs can be opened with
+    np.load(..., mmap_mode='r') once written.
+    """
+
+    def __init__(self, output_dir, save_vertices=False, num_vertices=5023, flush_every=256):
+        """
+        Args:
+            output_dir: Directory for the .npy files (created if missing)
+            save_vertices: Also write vertices.npy, a (N, num_vertices, 3) float32 cache
+            num_vertices: Vertices per mesh
+            flush_every: Frames between header updates on disk
+        """
+        os.makedirs(output_dir, exist_ok=True)
+        self.output_dir = output_dir
+        self.num_frames = 0
+        self._writers = {
+            name: NpyAppendWriter(os.path.join(output_dir, name + '.npy'), shape, dtype, flush_every)
+            for name, (shape, dtype) in PARAMETER_FILES.items()
+        }
+        if save_vertices:
+            self._writers['vertices'] = NpyAppendWriter(
+                os.path.join(output_dir, 'vertices.npy'), (num_vertices, 3), np.float32, flush_every
+            )
+
+    def write(self, timestamp, valid, expression, jaw_pose, eye_pose, head_pose, vertices=None):
+        """
+        Append one frame. jaw_pose/eye_pose may be None (manual mapping), in
+        which case zeros are stored.
+        """
+        writers = self._writers
+        writers['timestamps'].append(timestamp)
+        writers['valid'].append(valid)
+        writers['expression'].append(expression)
+        writers['jaw_pose'].append(jaw_pose if jaw_pose is not None else np.zeros(3))
+        writers['eye_pose'].append(eye_pose if eye_pose is not None else np.zeros(6))
+        writers['head_pose'].append(head_pose)
+        if 'vertices' in writers:
+            writers['vertices'].append(vertices)
+        self.num_frames += 1
+
+    def close(self):
+        for writer in self._writers.values():
+            writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class MeshVideoWriter:
+    """Renders an off-screen Visualizer into an MP4 file frame by frame."""
+
+    def __init__(self, path, visualizer, fps):
+        self.visualizer = visualizer
+        width, height = visualizer.plotter.window_size
+        self._writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+        if not self._writer.isOpened():
+            raise IOError(f"Cannot open video writer for: {path}")
+        self._bgr = np.empty((height, width, 3), dtype=np.uint8)
+
+    def write_frame(self):
+        rgb = self.visualizer.screenshot()
+        cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR, dst=self._bgr)
+        self._writer.write(self._bgr)
+
+    def close(self):
+        self._writer.release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
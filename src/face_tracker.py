@@ -0,0 +1,86 @@
+import numpy as np
+
+# Nose tip, forehead, chin and both cheeks: their mean is a cheap face centre
+ANCHOR_LANDMARKS = (1, 10, 152, 234, 454)
+
+
+def face_centroid(landmarks):
+    """(x, y) centre of one face from MediaPipe normalized landmarks."""
+    x = sum(landmarks[i].x for i in ANCHOR_LANDMARKS) / len(ANCHOR_LANDMARKS)
+    y = sum(landmarks[i].y for i in ANCHOR_LANDMARKS) / len(ANCHOR_LANDMARKS)
+    return x, y
+
+
+class FaceTracker:
+    """
+    Keeps stable identities for up to num_slots faces across frames.
+
+    Every detection is matched to the slot whose last centroid is nearest
+    (greedy, closest pairs first, within max_distance in normalized image
+    units). Unmatched detections take a free slot and get a new track id.
+    A slot keeps its identity through max_missing frames without a match,
+    so brief occlusions do not swap avatars.
+    """
+
+    def __init__(self, num_slots, max_distance=0.2, max_missing=15):
+        self.num_slots = num_slots
+        self.max_distance = max_distance
+        self.max_missing = max_missing
+        self.centroids = np.zeros((num_slots, 2))
+        self.track_ids = np.full(num_slots, -1)
+        self.missing = np.zeros(num_slots, dtype=int)
+        self.active = np.zeros(num_slots, dtype=bool)
+        self._next_id = 0
+
+    @property
+    def occupied(self):
+        """Slots holding an identity, whether or not it was seen this frame."""
+        return self.track_ids >= 0
+
+    def update(self, centroids):
+        """
+        Assign this frame's face centroids to slots.
+
+        Args:
+            centroids: Sequence of (x, y) per detected face
+
+        Returns:
+            List with the slot of every detection, -1 when all slots are taken
+        """
+        centroids = np.asarray(centroids, dtype=float).reshape(-1, 2)
+        slots = [-1] * len(centroids)
+        self.active[:] = False
+
+        occupied = np.flatnonzero(self.occupied)
+        if len(centroids) and len(occupied):
+            distances = np.linalg.norm(centroids[:, None] - self.centroids[occupied][None], axis=2)
+            for flat in np.argsort(distances, axis=None):
+                detection, k = divmod(int(flat), len(occupied))
+                if distances[detection, k] > self.max_distance:
+                    break
+                slot = occupied[k]
+                if slots[detection] < 0 and not self.active[slot]:
+                    slots[detection] = slot
+                    self.active[slot] = True
+
+        for detection in range(len(centroids)):
+            if slots[detection] >= 0:
+                continue
+            free = np.flatnonzero(~self.occupied)
+            if not len(free):
+                continue
+            slot = free[0]
+            self.track_ids[slot] = self._next_id
+            self._next_id += 1
+            slots[detection] = slot
+            self.active[slot] = True
+
+        for detection, slot in enumerate(slots):
+            if slot >= 0:
+                self.centroids[slot] = centroids[detection]
+
+        self.missing[self.active] = 0
+        self.missing[~self.active & self.occupied] += 1
+        self.track_ids[self.missing > self.max_missing] = -1
+        self.missing[~self.occupied] = 0
+        return slots
@@ -0,0 +1,253 @@
+import numpy as np
+
+# Channels filtered per frame, in packed order
+CHANNELS = (('expression', 100), ('jaw_pose', 3), ('eye_pose', 6), ('head_pose', 3))
+FILTERS = ('none', 'one_euro', 'kalman')
+
+
+def _smoothing_factor(cutoff, dt):
+    r = 2 * np.pi * cutoff * dt
+    return r / (r + 1)
+
+
+class OneEuroFilter:
+    """
+    One-Euro filter (Casiez et al. 2012) over a vector of channels.
+
+    Slow movements are smoothed with a low cutoff frequency to remove jitter;
+    the cutoff rises with the filtered speed so fast movements keep little lag.
+    min_cutoff and beta may be scalars or per-channel arrays. All state lives
+    in preallocated arrays, so filtering a frame allocates nothing.
+    """
+
+    def __init__(self, num_channels, min_cutoff=1.0, beta=5.0, d_cutoff=1.0):
+        """
+        Args:
+            num_channels: Length of the filtered vector
+            min_cutoff: Cutoff frequency (Hz) at rest; lower means smoother
+            beta: Speed coefficient; higher means less lag on fast motion
+            d_cutoff: Cutoff frequency (Hz) for the derivative estimate
+        """
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self._x = np.zeros(num_channels)
+        self._dx = np.zeros(num_channels)
+        self._delta = np.zeros(num_channels)
+        self._scratch = np.zeros(num_channels)
+        self._alpha = np.zeros(num_channels)
+        self._t = None
+
+    def reset(self):
+        """Forget the history; the next sample is passed through unfiltered."""
+        self._t = None
+
+    def __call__(self, x, t):
+        """
+        Filter one sample taken at time t (seconds).
+
+        Returns the filtered vector, an internal buffer overwritten by the
+        next call.
+        """
+        if self._t is None:
+            np.copyto(self._x, x)
+            self._dx.fill(0.0)
+            self._t = t
+            return self._x
+        dt = t - self._t
+        if dt <= 0:
+            return self._x
+        self._t = t
+
+        # Smoothed derivative: dx += a_d * ((x - x_prev) / dt - dx)
+        np.subtract(x, self._x, out=self._delta)
+        a_d = _smoothing_factor(self.d_cutoff, dt)
+        np.multiply(self._delta, 1.0 / dt, out=self._scratch)
+        self._scratch -= self._dx
+        self._scratch *= a_d
+        self._dx += self._scratch
+
+        # Speed-dependent cutoff -> alpha = r / (r + 1) with r = 2*pi*cutoff*dt
+        np.abs(self._dx, out=self._scratch)
+        self._scratch *= self.beta
+        self._scratch += self.min_cutoff
+        self._scratch *= 2 * np.pi * dt
+        np.add(self._scratch, 1.0, out=self._alpha)
+        np.divide(self._scratch, self._alpha, out=self._alpha)
+
+        self._delta *= self._alpha
+        self._x += self._delta
+        return self._x
+
+
+class KalmanFilter:
+    """
+    Constant-velocity Kalman filter run independently on every channel.
+
+    Each channel has a [position, velocity] state driven by white-noise
+    acceleration. The 2x2 covariances are kept as three arrays (p00, p01,
+    p11) so predict and update are a handful of vectorized operations with
+    no per-frame allocation.
+    """
+
+    def __init__(self, num_channels, process_noise=1000.0, measurement_noise=1e-3):
+        """
+        Args:
+            num_channels: Length of the filtered vector
+            process_noise: Acceleration variance; higher follows changes faster
+            measurement_noise: Measurement variance; higher means smoother
+        """
+        self.process_noise = process_noise
+        self.measurement_noise = measurement_noise
+        self._x = np.zeros(num_channels)
+        self._v = np.zeros(num_channels)
+        self._p00 = np.zeros(num_channels)
+        self._p01 = np.zeros(num_channels)
+        self._p11 = np.zeros(num_channels)
+        self._gain_x = np.zeros(num_channels)
+        self._gain_v = np.zeros(num_channels)
+        self._innovation = np.zeros(num_channels)
+        self._scratch = np.zeros(num_channels)
+        self._t = None
+
+    def reset(self):
+        """Forget the history; the next sample is passed through unfiltered."""
+        self._t = None
+
+    def __call__(self, z, t):
+        """
+        Filter one measurement taken at time t (seconds).
+
+        Returns the filtered vector, an internal buffer overwritten by the
+        next call.
+        """
+        if self._t is None:
+            np.copyto(self._x, z)
+            self._v.fill(0.0)
+            self._p00.fill(self.measurement_noise)
+            self._p01.fill(0.0)
+            self._p11.fill(1.0)
+            self._t = t
+            return self._x
+        dt = t - self._t
+        if dt <= 0:
+            return self._x
+        self._t = t
+        q = self.process_noise
+
+        # Predict: x += v dt, P = F P F^T + Q
+        np.multiply(self._v, dt, out=self._scratch)
+        self._x += self._scratch
+        np.multiply(self._p11, dt, out=self._scratch)
+        self._scratch += self._p01
+        self._scratch += self._p01
+        self._scratch *= dt
+        self._p00 += self._scratch
+        self._p00 += q * dt ** 4 / 4
+        np.multiply(self._p11, dt, out=self._scratch)
+        self._p01 += self._scratch
+        self._p01 += q * dt ** 3 / 2
+        self._p11 += q * dt ** 2
+
+        # Update with gain K = P H^T / (P00 + R), innovation y = z - x
+        np.add(self._p00, self.measurement_noise, out=self._scratch)
+        np.divide(self._p00, self._scratch, out=self._gain_x)
+        np.divide(self._p01, self._scratch, out=self._gain_v)
+        np.subtract(z, self._x, out=self._innovation)
+        np.multiply(self._gain_x, self._innovation, out=self._scratch)
+        self._x += self._scratch
+        np.multiply(self._gain_v, self._innovation, out=self._scratch)
+        self._v += self._scratch
+
+        # P = (I - K H) P; p11 first, as it needs the prior p01
+        np.multiply(self._gain_v, self._p01, out=self._scratch)
+        self._p11 -= self._scratch
+        np.subtract(1.0, self._gain_x, out=self._scratch)
+        self._p01 *= self._scratch
+        self._p00 *= self._scratch
+        return self._x
+
+
+class ParameterFilter:
+    """
+    Temporal filter stage between translation and deformation.
+
+    Packs expression, jaw, eye and head-angle channels into one vector,
+    smooths it with a OneEuroFilter or KalmanFilter (or passes it through
+    when smoother is None), and reports whether the result moved by more
+    than change_threshold since the last emitted frame. When it has not,
+    the driver can keep the current mesh and skip deformation and
+    rendering. The emitted parameters are exposed as views (expression,
+    jaw_pose, eye_pose, head_pose) that match the mesh on screen.
+    """
+
+    def __init__(self, smoother=None, change_threshold=0.0):
+        """
+        Args:
+            smoother: OneEuroFilter/KalmanFilter over num_channels, or None
+            change_threshold: Largest absolute per-channel change (expression
+                units / radians) still treated as "not moved"
+        """
+        self.smoother = smoother
+        self.change_threshold = change_threshold
+        self.num_channels = sum(size for _, size in CHANNELS)
+        self.skipped = 0
+        self._raw = np.zeros(self.num_channels)
+        self._emitted = np.zeros(self.num_channels)
+        self._change = np.zeros(self.num_channels)
+        self._has_emitted = False
+
+        self._raw_views = {}
+        offset = 0
+        for name, size in CHANNELS:
+            self._raw_views[name] = self._raw[offset:offset + size]
+            setattr(self, name, self._emitted[offset:offset + size])
+            offset += size
+
+    def reset(self):
+        """Restart filtering, e.g. after the face was lost."""
+        if self.smoother is not None:
+            self.smoother.reset()
+        self._has_emitted = False
+
+    def update(self, t, expression, jaw_pose=None, eye_pose=None, head_pose=None):
+        """
+        Filter one frame of parameters taken at time t (seconds).
+
+        Missing poses (None) are filtered as zeros. Returns True when the
+        filtered parameters changed meaningfully and the mesh should be
+        updated from the expression/jaw_pose/eye_pose/head_pose views.
+        """
+        for name, value in zip(('expression', 'jaw_pose', 'eye_pose', 'head_pose'),
+                               (expression, jaw_pose, eye_pose, head_pose)):
+            if value is None:
+                self._raw_views[name].fill(0.0)
+            else:
+                self._raw_views[name][:] = value
+
+        filtered = self._raw if self.smoother is None else self.smoother(self._raw, t)
+
+        if self._has_emitted:
+            np.subtract(filtered, self._emitted, out=self._change)
+            np.abs(self._change, out=self._change)
+            if self._change.max() <= self.change_threshold:
+                self.skipped += 1
+                return False
+        np.copyto(self._emitted, filtered)
+        self._has_emitted = True
+        return True
+
+
+def create_filter(kind='none', change_threshold=0.0, min_cutoff=1.0, beta=5.0,
+                  process_noise=1000.0, measurement_noise=1e-3):
+    """Build a ParameterFilter by name: 'none', 'one_euro' or 'kalman'."""
+    if kind not in FILTERS:
+        raise ValueError(f"Unknown filter: {kind}")
+    num_channels = sum(size for _, size in CHANNELS)
+    smoother = None
+    if kind == 'one_euro':
+        smoother = OneEuroFilter(num_channels, min_cutoff=min_cutoff, beta=beta)
+    elif kind == 'kalman':
+        smoother = KalmanFilter(num_channels, process_noise=process_noise,
+                                measurement_noise=measurement_noise)
+    return ParameterFilter(smoother, change_threshold)
@@ -0,0 +1,193 @@
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import tempfile
+
+import numpy as np
+
+# Bump whenever the set of cached arrays or their layout changes
+CACHE_VERSION = 2
+
+# FLAME 2020 stores 300 shape components followed by 100 expression components
+EXPRESSION_SLICE = slice(300, 400)
+
+
+def default_cache_dir(model_path):
+    """Cache directory that sits next to the source model, e.g. model/generic_model_cache/."""
+    root, _ = os.path.splitext(model_path)
+    return root + '_cache'
+
+
+def _file_sha256(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _read_meta(cache_dir):
+    try:
+        with open(os.path.join(cache_dir, 'meta.json')) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_meta(cache_dir, meta):
+    # A unique temporary name, so concurrent writers never share one file
+    fd, tmp_path = tempfile.mkstemp(dir=cache_dir, prefix='.meta.json.')
+    with os.fdopen(fd, 'w') as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp_path, os.path.join(cache_dir, 'meta.json'))
+
+
+def build_cache(model_path, cache_dir=None):
+    """
+    Convert a FLAME pickle into a compact, memory-mappable cache.
+
+    Only the arrays the driver needs are kept, stored as contiguous
+    .npy files so they can be opened with np.load(mmap_mode='r').
+
+    Every file is written under a temporary name and renamed into place,
+    so processes that have the previous files memory-mapped keep reading
+    them intact, and processes building the cache at the same time never
+    see each other's partial writes.
+
+    Args:
+        model_path: Path to FLAME model (generic_model.pkl)
+        cache_dir: Output directory (defaults to <model>_cache next to the pickle)
+
+    Returns:
+        Path to the cache directory
+    """
+    cache_dir = cache_dir or default_cache_dir(model_path)
+    os.makedirs(cache_dir, exist_ok=True)
+
+    with open(model_path, 'rb') as f:
+        model = pickle.load(f, encoding='latin1')
+
+    # np.asarray strips the chumpy wrappers from the pickled arrays
+    v_template = np.ascontiguousarray(np.asarray(model['v_template']), dtype=np.float32)
+    shapedirs = np.asarray(model['shapedirs'])
+    expression_basis = np.ascontiguousarray(
+        shapedirs[:, :, EXPRESSION_SLICE].reshape(-1, EXPRESSION_SLICE.stop - EXPRESSION_SLICE.start),
+        dtype=np.float32
+    )
+    faces = np.ascontiguousarray(np.asarray(model['f']), dtype=np.int32)
+
+    # Skinning data for jaw/eye articulation; J_regressor is a scipy sparse
+    # matrix in the pickle but only (5, 5023), so it is stored dense
+    J_regressor = model['J_regressor']
+    if hasattr(J_regressor, 'toarray'):
+        J_regressor = J_regressor.toarray()
+    posedirs = np.asarray(model['posedirs'])
+
+    arrays = {
+        'v_template': v_template,
+        'expression_basis': expression_basis,
+        'faces': faces,
+        'J_regressor': np.ascontiguousarray(J_regressor, dtype=np.float32),
+        'kintree_table': np.ascontiguousarray(np.asarray(model['kintree_table']), dtype=np.int64),
+        'weights': np.ascontiguousarray(np.asarray(model['weights']), dtype=np.float32),
+        'posedirs': np.ascontiguousarray(posedirs.reshape(-1, posedirs.shape[-1]), dtype=np.float32),
+    }
+    build_dir = tempfile.mkdtemp(dir=cache_dir, prefix='.build-')
+    try:
+        for name, array in arrays.items():
+            np.save(os.path.join(build_dir, name + '.npy'), array)
+        for name in arrays:
+            os.replace(os.path.join(build_dir, name + '.npy'), os.path.join(cache_dir, name + '.npy'))
+    finally:
+        shutil.rmtree(build_dir, ignore_errors=True)
+
+    stat = os.stat(model_path)
+    # meta.json is written last so a half-written cache is never considered valid
+    _write_meta(cache_dir, {
+        'version': CACHE_VERSION,
+        'source_sha256': _file_sha256(model_path),
+        'source_size': stat.st_size,
+        'source_mtime_ns': stat.st_mtime_ns,
+        'shapes': {name: list(array.shape) for name, array in arrays.items()},
+    })
+    return cache_dir
+
+
+def is_cache_valid(model_path, cache_dir=None):
+    """
+    Check whether the cache matches the current source model.
+
+    The size/mtime pair is checked first so a valid cache costs a stat() call;
+    the full SHA-256 is only recomputed when those differ (e.g. after a copy).
+    """
+    cache_dir = cache_dir or default_cache_dir(model_path)
+    meta = _read_meta(cache_dir)
+    if meta is None or meta.get('version') != CACHE_VERSION:
+        return False
+    if not os.path.exists(model_path):
+        # Cache was deployed without the licensed pickle; trust it as-is
+        return True
+
+    stat = os.stat(model_path)
+    if stat.st_size == meta.get('source_size') and stat.st_mtime_ns == meta.get('source_mtime_ns'):
+        return True
+    if _file_sha256(model_path) != meta.get('source_sha256'):
+        return False
+
+    # Same content, new timestamp: refresh so the next check is cheap again
+    meta['source_size'] = stat.st_size
+    meta['source_mtime_ns'] = stat.st_mtime_ns
+    _write_meta(cache_dir, meta)
+    return True
+
+
+def load_flame_model(model_path, cache_dir=None):
+    """
+    Load the FLAME arrays used by the driver, building the cache on first use.
+
+    Args:
+        model_path: Path to FLAME model (generic_model.pkl)
+        cache_dir: Cache directory (defaults to <model>_cache next to the pickle)
+
+    The arrays are float32 memory maps, so processes that use them as-is
+    (FlameTranslator with dtype=np.float32) share the same physical pages.
+    With any other dtype, e.g. the driver's default float64, each process
+    converts the basis into its own private copy.
+
+    Returns:
+        dict with read-only memory-mapped arrays:
+            'v_template': (5023, 3) float32
+            'expression_basis': (15069, 100) float32, rows ordered x, y, z per vertex
+            'f': (9976, 3) int32
+            'J_regressor': (5, 5023) float32
+            'kintree_table': (2, 5) int64
+            'weights': (5023, 5) float32 skinning weights
+            'posedirs': (15069, 36) float32 pose-corrective basis
+    """
+    cache_dir = cache_dir or default_cache_dir(model_path)
+    if not is_cache_valid(model_path, cache_dir):
+        print(f"Building FLAME cache in: {os.path.abspath(cache_dir)}")
+        build_cache(model_path, cache_dir)
+
+    def _load(name):
+        return np.load(os.path.join(cache_dir, name + '.npy'), mmap_mode='r')
+
+    return {
+        'v_template': _load('v_template'),
+        'expression_basis': _load('expression_basis'),
+        'f': _load('faces'),
+        'J_regressor': _load('J_regressor'),
+        'kintree_table': _load('kintree_table'),
+        'weights': _load('weights'),
+        'posedirs': _load('posedirs'),
+    }
+
+
+if __name__ == "__main__":
+    import sys
+
+    source = sys.argv[1] if len(sys.argv) > 1 else 'model/generic_model.pkl'
+    output = build_cache(source, sys.argv[2] if len(sys.argv) > 2 else None)
+    print(f"✓ FLAME cache written to: {os.path.abspath(output)}")
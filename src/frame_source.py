@@ -0,0 +1,202 @@
+import cv2
+import numpy as np
+
+# Face-oval landmarks: their extent is the face's bounding box
+FACE_OVAL = (10, 338, 297, 332, 284, 251, 389, 356, 454, 323, 361, 288, 397, 365, 379, 378,
+             400, 377, 152, 148, 176, 149, 150, 136, 172, 58, 132, 93, 234, 127, 162, 21,
+             54, 103, 67, 109)
+
+# Smallest region of interest, in pixels
+MIN_ROI_SIZE = 64
+
+# Detection regions are only downscaled when their longest side is more
+# than this many times detect_size. Resizing costs about 16 times more per
+# output pixel than the RGB conversion does per input pixel, so below that
+# converting the whole region is cheaper than resizing it first
+DOWNSCALE_MARGIN = 4.0
+
+
+class FrameSource:
+    """
+    Input stage between cv2.VideoCapture and the face landmarker.
+
+    Frames are decoded into reused buffers, and detection gets an RGB image
+    that is only as large as it needs to be: downscaled so its longest side
+    is `detect_size` when that saves time (see DOWNSCALE_MARGIN), and with
+    roi=True cropped to a square around
+    the last face. Landmarks found in a crop are mapped back to normalized
+    full-frame coordinates, so everything downstream is unchanged.
+
+    The crop only moves when the face gets close to its edge or changes
+    size a lot. A steady crop keeps MediaPipe's own frame-to-frame tracking
+    valid, so it does not have to re-detect the face.
+    """
+
+    def __init__(self, cap, detect_size=None, roi=False, roi_margin=0.5, stride=1, num_buffers=1,
+                 first_frame=0):
+        """
+        Args:
+            cap: Opened cv2.VideoCapture
+            detect_size: Longest side of the detection image in pixels, for
+                regions large enough to be worth downscaling (None = full
+                resolution)
+            roi: Crop detection to the region around the last face
+            roi_margin: Space around the face in the crop, relative to the
+                face size on each side
+            stride: Return every stride-th frame; the others are skipped
+                without being decoded into an image (offline jobs)
+            num_buffers: Decode buffers used in turn. A returned frame is
+                overwritten num_buffers reads later, so pipelines that keep
+                frames in flight need one per frame held, or 0 to pass
+                their own buffer to every read().
+            first_frame: Source index of the frame `cap` is positioned at
+        """
+        self.cap = cap
+        self.detect_size = detect_size
+        self.roi = roi
+        self.roi_margin = roi_margin
+        self.stride = stride
+        self.index = first_frame - 1    # source index of the last frame read
+        self.frames_read = 0
+        self.width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        self._buffers = [None] * num_buffers
+        self._next_buffer = 0
+        self._small = None
+        self._rgb = None
+        self._crop = None           # (x, y, width, height) for the next frame
+
+    def read(self, out=None):
+        """
+        Next BGR frame (a reused buffer), or None at the end of the stream.
+
+        With num_buffers=0 the caller owns the buffers: the frame is decoded
+        into `out` (e.g. from a BufferPool), or into a new array when `out`
+        is None or does not fit the frame.
+        """
+        if self.frames_read:
+            for _ in range(self.stride - 1):
+                if not self.cap.grab():
+                    return None
+                self.index += 1
+        if not self._buffers:
+            ret, frame = self.cap.read(out)
+            if not ret:
+                return None
+        else:
+            slot = self._next_buffer
+            self._next_buffer = (slot + 1) % len(self._buffers)
+            ret, frame = self.cap.read(self._buffers[slot])
+            if not ret:
+                return None
+            # Sizes are only known once the first frame is decoded (e.g. webcams)
+            self._buffers[slot] = frame
+        self.height, self.width = frame.shape[:2]
+        self.index += 1
+        self.frames_read += 1
+        return frame
+
+    def detection_frame(self, frame):
+        """
+        RGB image to run detection on, and the crop it was taken from.
+
+        Returns:
+            (image, crop): image is an (H, W, 3) uint8 array overwritten by
+            the next call; crop is (x, y, width, height) in frame pixels and
+            goes to map_result() along with this frame's detection.
+        """
+        height, width = frame.shape[:2]
+        crop = self._crop if self.roi and self._crop is not None else (0, 0, width, height)
+        x, y, crop_width, crop_height = crop
+        region = frame[y:y + crop_height, x:x + crop_width]
+
+        scale = 1.0
+        if self.detect_size and max(crop_width, crop_height) > DOWNSCALE_MARGIN * self.detect_size:
+            scale = self.detect_size / max(crop_width, crop_height)
+        if scale < 1.0:
+            size = (max(1, round(crop_width * scale)), max(1, round(crop_height * scale)))
+            self._small = _buffer(self._small, (size[1], size[0], 3))
+            # INTER_AREA is several times slower at non-integer factors
+            region = cv2.resize(region, size, dst=self._small, interpolation=cv2.INTER_LINEAR)
+        self._rgb = _buffer(self._rgb, region.shape)
+        cv2.cvtColor(region, cv2.COLOR_BGR2RGB, dst=self._rgb)
+        return self._rgb, crop
+
+    def to_frame(self, landmarks, crop):
+        """
+        Map normalized landmarks of a crop to the full frame, in place.
+        `landmarks` is a MediaPipe landmark list or an (N, 3) array.
+        """
+        x, y, crop_width, crop_height = crop
+        if (x, y, crop_width, crop_height) == (0, 0, self.width, self.height):
+            return landmarks
+        sx, sy = crop_width / self.width, crop_height / self.height
+        ox, oy = x / self.width, y / self.height
+        if isinstance(landmarks, np.ndarray):
+            landmarks[:, 0] *= sx
+            landmarks[:, 0] += ox
+            landmarks[:, 1] *= sy
+            landmarks[:, 1] += oy
+            landmarks[:, 2] *= sx
+            return landmarks
+        for point in landmarks:
+            point.x = ox + point.x * sx
+            point.y = oy + point.y * sy
+            # z shares x's scale (image width)
+            point.z *= sx
+        return landmarks
+
+    def map_result(self, result, crop):
+        """
+        Map every face of a FaceLandmarkerResult found in `crop` back to
+        the full frame, then move the region of interest to the first face
+        (or release it when there is none).
+        """
+        for landmarks in result.face_landmarks:
+            self.to_frame(landmarks, crop)
+        if self.roi:
+            self.track(result.face_landmarks[0] if result.face_landmarks else None)
+        return result
+
+    def track(self, landmarks):
+        """
+        Update the region of interest from full-frame landmarks (list or
+        (N, 3) array; None = no face).
+        """
+        if landmarks is None:
+            self._crop = None
+            return
+        if isinstance(landmarks, np.ndarray):
+            xs, ys = landmarks[FACE_OVAL, 0], landmarks[FACE_OVAL, 1]
+        else:
+            xs = [landmarks[i].x for i in FACE_OVAL]
+            ys = [landmarks[i].y for i in FACE_OVAL]
+        left, right = min(xs) * self.width, max(xs) * self.width
+        top, bottom = min(ys) * self.height, max(ys) * self.height
+        face = max(right - left, bottom - top)
+
+        if self._crop is not None:
+            x, y, size, _ = self._crop
+            # Keep the crop while the face, with half the margin around it,
+            # stays inside and has not shrunk to less than half the crop
+            inner = 0.5 * self.roi_margin * face
+            if (x <= left - inner and right + inner <= x + size and
+                    y <= top - inner and bottom + inner <= y + size and
+                    face * (1 + 2 * self.roi_margin) > 0.5 * size):
+                return
+
+        size = int(min(max(face * (1 + 2 * self.roi_margin), MIN_ROI_SIZE), self.width, self.height))
+        x = int(min(max((left + right - size) / 2, 0), self.width - size))
+        y = int(min(max((top + bottom - size) / 2, 0), self.height - size))
+        self._crop = (x, y, size, size)
+
+    def reset(self):
+        """Detect on the full frame again."""
+        self._crop = None
+
+
+def _buffer(buffer, shape):
+    """Reuse `buffer` when it has `shape`, otherwise allocate a new uint8 one."""
+    if buffer is None or buffer.shape != shape:
+        return np.empty(shape, dtype=np.uint8)
+    return buffer
@@ -0,0 +1,234 @@
+import math
+
+import numpy as np
+
+METHODS = ('landmarks', 'kabsch', 'matrix')
+
+# Nose tip and outer eye corners used by the 'landmarks' method
+NOSE_TIP, LEFT_EYE, RIGHT_EYE = 1, 33, 263
+
+# Upper-face landmarks that move rigidly with the skull (no lips, jaw or
+# eyelids): nose bridge and tip, eye corners, forehead, temples and cheeks
+RIGID_LANDMARKS = (1, 4, 5, 6, 8, 9, 10, 33, 133, 151, 168, 195, 197, 234, 263, 362, 454)
+
+# On a frontal face the eye-centre -> nose-tip direction points this far
+# below the camera axis, so it is rotated back once, up front
+CORRECTION_PITCH = np.radians(35)
+R_CORRECTION = np.array([
+    [1, 0, 0],
+    [0, np.cos(CORRECTION_PITCH), -np.sin(CORRECTION_PITCH)],
+    [0, np.sin(CORRECTION_PITCH), np.cos(CORRECTION_PITCH)],
+])
+
+# Sign masks that conjugate a rotation by a diagonal reflection (D R D).
+# The avatar keeps the driver's convention of mirrored yaw and pitch:
+# camera space (y up, z towards the viewer) flips z, MediaPipe image space
+# (y down, z away from the camera) flips y.
+_CAMERA_TO_AVATAR = np.array([[1, 1, -1], [1, 1, -1], [-1, -1, 1]])
+_IMAGE_TO_AVATAR = np.array([[1, -1, 1], [-1, 1, -1], [1, -1, 1]])
+
+
+def head_rotation(angles, out):
+    """
+    Write the avatar rotation R_roll @ R_pitch @ R_yaw for angles = (yaw,
+    pitch, roll) into the (3, 3) array `out` without allocating.
+
+    Zero angles are a frontal face; the result is applied to the mesh in a
+    single transform_mesh() pass.
+    """
+    yaw, pitch, roll = angles[0], angles[1], angles[2]
+    cy, sy = math.cos(yaw), math.sin(yaw)
+    cp, sp = math.cos(pitch), math.sin(pitch)
+    cr, sr = math.cos(roll), math.sin(roll)
+    out[0, 0], out[0, 1], out[0, 2] = cr * cy - sr * sp * sy, -sr * cp, cr * sy + sr * sp * cy
+    out[1, 0], out[1, 1], out[1, 2] = sr * cy + cr * sp * sy, cr * cp, sr * sy - cr * sp * cy
+    out[2, 0], out[2, 1], out[2, 2] = -cp * sy, sp, cp * cy
+    return out
+
+
+def rotation_matrices(angles, out=None):
+    """head_rotation() for an (N, 3) array of angles, returning (N, 3, 3)."""
+    angles = np.asarray(angles, dtype=np.float64)
+    cy, sy = np.cos(angles[..., 0]), np.sin(angles[..., 0])
+    cp, sp = np.cos(angles[..., 1]), np.sin(angles[..., 1])
+    cr, sr = np.cos(angles[..., 2]), np.sin(angles[..., 2])
+    if out is None:
+        out = np.empty(angles.shape[:-1] + (3, 3))
+    out[..., 0, 0] = cr * cy - sr * sp * sy
+    out[..., 0, 1] = -sr * cp
+    out[..., 0, 2] = cr * sy + sr * sp * cy
+    out[..., 1, 0] = sr * cy + cr * sp * sy
+    out[..., 1, 1] = cr * cp
+    out[..., 1, 2] = sr * sy - cr * sp * cy
+    out[..., 2, 0] = -cp * sy
+    out[..., 2, 1] = sp
+    out[..., 2, 2] = cp * cy
+    return out
+
+
+def rotation_angles(rotations, out=None):
+    """Inverse of rotation_matrices(): (..., 3, 3) rotations to (..., 3) yaw, pitch, roll."""
+    rotations = np.asarray(rotations)
+    if out is None:
+        out = np.empty(rotations.shape[:-2] + (3,))
+    out[..., 0] = np.arctan2(-rotations[..., 2, 0], rotations[..., 2, 2])
+    out[..., 1] = np.arcsin(np.clip(rotations[..., 2, 1], -1.0, 1.0))
+    out[..., 2] = np.arctan2(-rotations[..., 0, 1], rotations[..., 1, 1])
+    return out
+
+
+def landmarks_to_points(landmarks, indices, out, aspect_ratio=1.0):
+    """
+    Gather the landmarks at `indices` into the (K, 3) array `out`.
+
+    x and z are scaled by the frame's width / height so all three axes
+    share one unit. `landmarks` is a MediaPipe landmark list or an (N, 3)
+    array.
+    """
+    if isinstance(landmarks, np.ndarray):
+        out[:] = landmarks[list(indices)]
+    else:
+        for k, i in enumerate(indices):
+            point = landmarks[i]
+            out[k, 0], out[k, 1], out[k, 2] = point.x, point.y, point.z
+    out[:, 0] *= aspect_ratio
+    out[:, 2] *= aspect_ratio
+    return out
+
+
+def kabsch_rotation(reference, points):
+    """
+    Least-squares rotations taking centred `reference` (K, 3) onto `points`
+    (K, 3) or (N, K, 3), as (3, 3) or (N, 3, 3) arrays.
+    """
+    points = points - points.mean(axis=-2, keepdims=True)
+    covariance = np.matmul(reference.T, points)
+    u, _, vt = np.linalg.svd(covariance)
+    v = np.swapaxes(vt, -1, -2)
+    # Flip the weakest axis when the best orthogonal fit is a reflection
+    det = np.linalg.det(np.matmul(v, np.swapaxes(u, -1, -2)))
+    v[..., :, 2] *= np.sign(det)[..., None]
+    return np.matmul(v, np.swapaxes(u, -1, -2))
+
+
+def _orthonormalize(matrices):
+    """Nearest rotations to (..., 3, 3) matrices that may carry scale."""
+    u, _, vt = np.linalg.svd(matrices)
+    return np.matmul(u, vt)
+
+
+class HeadPoseSolver:
+    """
+    Head yaw, pitch and roll of one face, in radians, zero when frontal.
+
+    Methods:
+        'landmarks': nose tip against the eye corners. Cheapest; this was
+            the driver's original estimate. Only the nose direction is
+            measured, so head tilt is not observed. The returned roll is not
+            zero on a turned head, though: it comes from composing yaw and
+            pitch with the fixed R_CORRECTION.
+        'kabsch': least-squares rigid fit of RIGID_LANDMARKS against the
+            first frame after reset(), which is taken as the frontal pose.
+        'matrix': MediaPipe's facial_transformation_matrixes (the landmarker
+            must be created with that output enabled).
+
+    Calling the solver for one face allocates nothing on the 'landmarks'
+    path and returns internal buffers; solve_batch() handles whole clips.
+    """
+
+    def __init__(self, method='landmarks', aspect_ratio=1.0, landmark_subset=RIGID_LANDMARKS):
+        """
+        Args:
+            method: One of METHODS
+            aspect_ratio: Frame width / height, for the 'kabsch' fit
+            landmark_subset: Landmark indices fitted by 'kabsch'
+        """
+        if method not in METHODS:
+            raise ValueError(f"Unknown head pose method: {method}")
+        self.method = method
+        self.aspect_ratio = aspect_ratio
+        self.landmark_subset = tuple(landmark_subset)
+        self.angles = np.zeros(3)
+        self.rotation = np.eye(3)
+        self._scratch = np.empty((3, 3))
+        self._points = np.empty((len(self.landmark_subset), 3))
+        self._reference = None
+
+    def reset(self):
+        """Take the next 'kabsch' frame as the new frontal reference."""
+        self._reference = None
+
+    def __call__(self, landmarks, transformation_matrix=None):
+        """
+        Solve one face.
+
+        Args:
+            landmarks: MediaPipe landmark list or (478, 3) array
+            transformation_matrix: (4, 4) facial transformation matrix,
+                required by the 'matrix' method
+
+        Returns:
+            (yaw, pitch, roll) array, overwritten by the next call. The
+            matching avatar rotation is in self.rotation.
+        """
+        if self.method == 'landmarks':
+            nose, left, right = landmarks[NOSE_TIP], landmarks[LEFT_EYE], landmarks[RIGHT_EYE]
+            if isinstance(landmarks, np.ndarray):
+                fx = nose[0] - (left[0] + right[0]) / 2
+                fy = nose[1] - (left[1] + right[1]) / 2
+                fz = nose[2] - (left[2] + right[2]) / 2
+            else:
+                fx = nose.x - (left.x + right.x) / 2
+                fy = nose.y - (left.y + right.y) / 2
+                fz = nose.z - (left.z + right.z) / 2
+            # R_pitch(-b) @ R_yaw(-a) @ R_CORRECTION, as one matrix
+            head_rotation((-math.atan2(fx, -fz), -math.atan2(fy, -fz), 0.0), self._scratch)
+            np.dot(self._scratch, R_CORRECTION, out=self.rotation)
+        elif self.method == 'kabsch':
+            points = landmarks_to_points(landmarks, self.landmark_subset, self._points, self.aspect_ratio)
+            if self._reference is None:
+                self._reference = points - points.mean(axis=0)
+            np.multiply(kabsch_rotation(self._reference, points), _IMAGE_TO_AVATAR, out=self.rotation)
+        else:
+            if transformation_matrix is None:
+                raise ValueError("The 'matrix' head pose needs facial_transformation_matrixes")
+            rotation = _orthonormalize(np.asarray(transformation_matrix)[:3, :3])
+            np.multiply(rotation, _CAMERA_TO_AVATAR, out=self.rotation)
+
+        r = self.rotation
+        self.angles[0] = math.atan2(-r[2, 0], r[2, 2])
+        self.angles[1] = math.asin(min(1.0, max(-1.0, r[2, 1])))
+        self.angles[2] = math.atan2(-r[0, 1], r[1, 1])
+        return self.angles
+
+    def solve_batch(self, landmarks, transformation_matrices=None):
+        """
+        Solve a whole clip at once.
+
+        Args:
+            landmarks: (N, 478, 3) array (e.g. Recording.landmarks)
+            transformation_matrices: (N, 4, 4) array for the 'matrix' method
+
+        Returns:
+            (N, 3) array of yaw, pitch, roll. 'kabsch' uses the current
+            reference, or the first frame when there is none.
+        """
+        if self.method == 'landmarks':
+            points = np.asarray(landmarks)[:, [NOSE_TIP, LEFT_EYE, RIGHT_EYE]].astype(np.float64)
+            forward = points[:, 0] - (points[:, 1] + points[:, 2]) / 2
+            angles = np.zeros((len(forward), 3))
+            angles[:, 0] = -np.arctan2(forward[:, 0], -forward[:, 2])
+            angles[:, 1] = -np.arctan2(forward[:, 1], -forward[:, 2])
+            rotations = np.matmul(rotation_matrices(angles), R_CORRECTION)
+        elif self.method == 'kabsch':
+            points = np.asarray(landmarks)[:, list(self.landmark_subset)].astype(np.float64)
+            points[..., 0] *= self.aspect_ratio
+            points[..., 2] *= self.aspect_ratio
+            if self._reference is None:
+                self._reference = points[0] - points[0].mean(axis=0)
+            rotations = kabsch_rotation(self._reference, points) * _IMAGE_TO_AVATAR
+        else:
+            if transformation_matrices is None:
+                raise ValueError("The 'matrix' head pose needs facial_transformation_matrixes")
+            rotations = _orthonormalize(np.asarray(transformation_matrices)[:, :3, :3]) * _CAMERA_TO_AVATAR
+        return rotation_angles(rotations)
@@ -0,0 +1,100 @@
+import time
+
+from mediapipe.tasks import python
+from mediapipe.tasks.python import vision
+
+from pipeline import LatestSlot
+
+
+class LiveStreamDetector:
+    """
+    FaceLandmarker in LIVE_STREAM mode that never blocks the capture loop.
+
+    submit() hands a frame to detect_async() and returns at once. While a
+    frame is still being detected, newer frames are dropped here instead of
+    queueing behind it, and counted in `dropped`. The result callback runs
+    on MediaPipe's thread and publishes (timestamp_ms, result) to a
+    LatestSlot; latest() returns the newest result not consumed yet, so
+    translation and rendering always work on the freshest detection.
+    """
+
+    def __init__(self, model_path, num_faces=1, transformation_matrixes=False, stall_timeout=1.0):
+        """
+        Args:
+            model_path: MediaPipe face_landmarker.task
+            num_faces: Maximum number of faces to detect
+            transformation_matrixes: Also output facial transformation matrices
+            stall_timeout: Seconds after which a frame without a result is
+                given up on, so a frame MediaPipe drops internally cannot
+                stall submission
+        """
+        self.stall_timeout = stall_timeout
+        self.slot = LatestSlot()
+        self.submitted = 0
+        self.completed = 0
+        self.dropped = 0
+        self.latency_ms = 0.0
+        self._submit_time = 0.0
+        self._last_timestamp = -1   # last submitted, written by submit() only
+        self._last_done = -1        # last completed, written by the callback only
+
+        options = vision.FaceLandmarkerOptions(
+            base_options=python.BaseOptions(model_asset_path=model_path),
+            output_face_blendshapes=True,
+            output_facial_transformation_matrixes=transformation_matrixes,
+            running_mode=vision.RunningMode.LIVE_STREAM,
+            num_faces=num_faces,
+            result_callback=self._on_result,
+        )
+        self.landmarker = vision.FaceLandmarker.create_from_options(options)
+
+    def _on_result(self, result, image, timestamp_ms):
+        # MediaPipe's thread: the only writer of these fields and the slot
+        self.latency_ms = 1000 * (time.perf_counter() - self._submit_time)
+        self.completed += 1
+        self._last_done = timestamp_ms
+        self.slot.put((timestamp_ms, result))
+
+    @property
+    def busy(self):
+        """True while a submitted frame is still being detected."""
+        return (self._last_done < self._last_timestamp
+                and time.perf_counter() - self._submit_time < self.stall_timeout)
+
+    def submit(self, image, timestamp_ms):
+        """
+        Start detection on an mp.Image unless a frame is still in flight.
+
+        Returns True when the frame was submitted, False when it was dropped.
+        Timestamps must increase; repeated ones are dropped as well.
+        """
+        if self.busy or timestamp_ms <= self._last_timestamp:
+            self.dropped += 1
+            return False
+        self._last_timestamp = timestamp_ms
+        self._submit_time = time.perf_counter()
+        self.submitted += 1
+        self.landmarker.detect_async(image, timestamp_ms)
+        return True
+
+    def latest(self):
+        """(timestamp_ms, FaceLandmarkerResult) of the newest unseen detection, or None."""
+        return self.slot.take()
+
+    def stats(self):
+        return {
+            'submitted': self.submitted,
+            'completed': self.completed,
+            'dropped': self.dropped,
+            'unused_results': self.slot.overwritten,
+            'latency_ms': self.latency_ms,
+        }
+
+    def close(self):
+        self.landmarker.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
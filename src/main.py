@@ -1,10 +1,23 @@
+import argparse
+import time
+
 import cv2
 import mediapipe as mp
 import numpy as np
 from mediapipe.tasks import python
 from mediapipe.tasks.python import vision
 
-from translator import FlameTranslator 
+from exporter import MeshVideoWriter, ParameterExporter
+from face_tracker import FaceTracker, face_centroid
+from filters import FILTERS, create_filter
+from frame_source import FrameSource
+from head_pose import METHODS as HEAD_POSE_METHODS, HeadPoseSolver, head_rotation
+from live_stream import LiveStreamDetector
+from param_stream import ENCODINGS as STREAM_ENCODINGS, ParameterSender, parse_address
+from pipeline import BufferPool, Pipeline
+from profiler import NullProfiler, Profiler, open_sink
+from recording import Recording, RecordingWriter
+from translator import BLENDSHAPE_NAMES, FlameTranslator
 from visualizer import Visualizer
 
 # --- Configuration ---
@@ -12,64 +25,177 @@ MODEL_PATH = 'face_landmarker.task'
 FLAME_PATH = 'model/generic_model.pkl'
 MAPPINGS_PATH = './mappings'  # Will fallback to manual if not found
 VIDEO_PATH = 'examples/example2.mov'
+REPLAY_POSE_CHUNK = 4096  # Frames per batched head-pose solve during replay
+FLAME_DTYPE = np.float64  # np.float32 halves memory bandwidth in the deformation
+
+def solve_head_pose(solver, result, detection=0):
+    """Head (yaw, pitch, roll) of one detection in a FaceLandmarker result."""
+    matrix = result.facial_transformation_matrixes[detection] if solver.method == 'matrix' else None
+    return solver(result.face_landmarks[detection], matrix)
+
+def create_detector(model_path=MODEL_PATH, num_faces=1, transformation_matrixes=False):
+    """
+    Create a MediaPipe FaceLandmarker in VIDEO mode with blendshapes enabled,
+    and facial transformation matrices when requested.
+    """
+    base_options = python.BaseOptions(model_asset_path=model_path)
+    options = vision.FaceLandmarkerOptions(
+        base_options=base_options,
+        output_face_blendshapes=True,
+        output_facial_transformation_matrixes=transformation_matrixes,
+        running_mode=vision.RunningMode.VIDEO,
+        num_faces=num_faces
+    )
+    return vision.FaceLandmarker.create_from_options(options)
+
+def create_frame_source(args, cap, num_buffers=1):
+    """FrameSource for `cap` with the --detect-size / --roi / --frame-stride options."""
+    return FrameSource(cap, detect_size=args.detect_size, roi=args.roi, roi_margin=args.roi_margin,
+                       stride=args.frame_stride, num_buffers=num_buffers)
 
-def get_head_rotation(landmarks):
-    """Extract head rotation from MediaPipe landmarks."""
-    nose = np.array([landmarks[1].x, landmarks[1].y, landmarks[1].z])
-    left_eye = np.array([landmarks[33].x, landmarks[33].y, landmarks[33].z])
-    right_eye = np.array([landmarks[263].x, landmarks[263].y, landmarks[263].z])
+def create_profiler(args, source_fps):
+    """Profiler for the live driver, or a no-op NullProfiler when disabled."""
+    if not (args.profile or args.profile_overlay or args.profile_log):
+        return NullProfiler()
+    sink = open_sink(args.profile_log) if args.profile_log else None
+    return Profiler(source_fps=source_fps, sink=sink)
 
-    eye_center = (left_eye + right_eye) / 2
-    forward = nose - eye_center
+def frame_aspect_ratio(cap):
+    """Frame width / height of `cap`, or None when it does not report a size."""
+    if cap is None or not cap.get(cv2.CAP_PROP_FRAME_HEIGHT):
+        return None
+    return cap.get(cv2.CAP_PROP_FRAME_WIDTH) / cap.get(cv2.CAP_PROP_FRAME_HEIGHT)
 
-    yaw = np.arctan2(forward[0], forward[2])
-    pitch = np.arctan2(forward[1], forward[2])
+def create_head_pose(args, cap=None):
+    """HeadPoseSolver for --head-pose, using the frame aspect ratio of `cap`."""
+    return HeadPoseSolver(args.head_pose, aspect_ratio=frame_aspect_ratio(cap) or 1.0)
 
-    return yaw, pitch
+def create_recorder(args, cap):
+    """RecordingWriter for --record, or None when recording is off."""
+    if not args.record:
+        return None
+    return RecordingWriter(args.record, append=args.record_append, aspect_ratio=frame_aspect_ratio(cap))
 
-def main():
+def create_parameter_filter(args):
+    """Temporal filter stage configured from the command line."""
+    return create_filter(args.filter, change_threshold=args.change_threshold,
+                         min_cutoff=args.min_cutoff, beta=args.beta,
+                         process_noise=args.process_noise, measurement_noise=args.measurement_noise)
+
+def create_sender(args, num_avatars=1):
+    """ParameterSender for --stream, or None when streaming is off."""
+    if not args.stream:
+        return None
+    address = parse_address(args.stream)
+    print(f"✓ Streaming parameters to {address[0]}:{address[1]} over UDP "
+          f"({args.stream_encoding}{', delta' if args.stream_delta else ''})")
+    return ParameterSender(address, num_avatars=num_avatars, encoding=args.stream_encoding,
+                           delta=args.stream_delta, keyframe_interval=args.stream_keyframe_interval,
+                           threshold=args.stream_threshold)
+
+def close_sender(sender, elapsed):
+    if sender is None:
+        return
+    sender.close()
+    rate = sender.bytes_sent / elapsed / 1024 if elapsed > 0 else 0.0
+    print(f"✓ Streamed {sender.packets_sent} packets, {sender.bytes_sent} bytes ({rate:.1f} KB/s)")
+
+def create_deformer(translator, args):
+    """
+    translator.deform_mesh, or deform_incremental / deform_low_rank when
+    --incremental or --rank / --max-error-mm is set.
+    """
+    if args.incremental:
+        translator.init_incremental(epsilon=args.incremental_epsilon, region_tolerance=args.region_tolerance)
+        return translator.deform_incremental
+    if args.rank is not None or args.max_error_mm is not None:
+        rank, error_mm = translator.init_low_rank(rank=args.rank or None, max_error_mm=args.max_error_mm)
+        print(f"✓ Low-rank basis: {rank} components, max vertex error {error_mm:.3f} mm")
+        return translator.deform_low_rank
+    return translator.deform_mesh
+
+def run_live(args):
     # Initialize translator (will auto-detect if mappings are available)
     print("--- Initializing FLAME Translator ---")
-    translator = FlameTranslator(FLAME_PATH, mappings_path=MAPPINGS_PATH)
-    visualizer = Visualizer(translator.model['f'])
+    translator = FlameTranslator(args.flame, mappings_path=args.mappings, dtype=FLAME_DTYPE)
+    visualizer = Visualizer(translator.model['f'], max_fps=args.render_fps,
+                            num_vertices=translator.v_template.shape[0])
+
+    # Reused every frame so the mesh path allocates nothing
+    rotation = np.empty((3, 3))
+    param_filter = create_parameter_filter(args)
+    deform = create_deformer(translator, args)
+    sender = create_sender(args)
     
-    # Setup MediaPipe
-    base_options = python.BaseOptions(model_asset_path=MODEL_PATH)
-    options = vision.FaceLandmarkerOptions(
-        base_options=base_options,
-        output_face_blendshapes=True,
-        running_mode=vision.RunningMode.VIDEO
-    )
-    detector = vision.FaceLandmarker.create_from_options(options)
+    # Setup MediaPipe: blocking VIDEO mode, or LIVE_STREAM detection that
+    # runs beside this loop and hands back its newest result
+    if args.live_stream:
+        detector = LiveStreamDetector(args.model, transformation_matrixes=args.head_pose == 'matrix')
+    else:
+        detector = create_detector(args.model, transformation_matrixes=args.head_pose == 'matrix')
     
     # Open video
-    cap = cv2.VideoCapture(VIDEO_PATH)
-    fps = cap.get(cv2.CAP_PROP_FPS)
+    cap = cv2.VideoCapture(args.video)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    frame_source = create_frame_source(args, cap)
     frame_count = 0
+    profiler = create_profiler(args, fps)
+    head_pose_solver = create_head_pose(args, cap)
+    recorder = create_recorder(args, cap)
 
     print("\nStarting Real-Time FLAME Avatar Driver")
     print(f"FPS: {fps}")
+    if args.head_pose == 'kabsch':
+        print("Look straight at the camera: the first face is the frontal reference ('c' recalibrates)")
     print("Press 'q' to quit\n")
 
+    start_time = time.perf_counter()
+    face_streamed = False
     while cap.isOpened():
-        ret, frame = cap.read()
-        if not ret: 
+        with profiler.span('capture'):
+            frame = frame_source.read()
+        if frame is None:
             break
 
-        # Convert frame to MediaPipe format
-        rgb_frame = mp.Image(image_format=mp.ImageFormat.SRGB, 
-                             data=cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
-        timestamp = int(1000 * frame_count / fps)
+        # Downscaled / cropped RGB image in MediaPipe format
+        with profiler.span('convert'):
+            detection_image, crop = frame_source.detection_frame(frame)
+            rgb_frame = mp.Image(image_format=mp.ImageFormat.SRGB, data=detection_image)
+        timestamp = int(1000 * frame_source.index / fps)
         frame_count += 1
 
         # Detect face
-        result = detector.detect_for_video(rgb_frame, timestamp)
+        with profiler.span('detect'):
+            if args.live_stream:
+                detector.submit(rgb_frame, timestamp)
+                latest = detector.latest()
+                result = None
+                if latest is not None:
+                    timestamp, result = latest
+            else:
+                result = detector.detect_for_video(rgb_frame, timestamp)
+                # Landmarks back to full-frame coordinates; the ROI follows the face
+                frame_source.map_result(result, crop)
 
-        if result.face_blendshapes:
+        if result is None:
+            # No new detection finished since the last frame: keep the mesh
+            pass
+        elif not result.face_blendshapes:
+            param_filter.reset()
+            if recorder is not None:
+                recorder.write(timestamp, False)
+            if sender is not None and face_streamed:
+                # Tell remote avatars once that the face is gone; they hold their last pose
+                sender.send(timestamp, param_filter.expression, param_filter.jaw_pose,
+                            param_filter.eye_pose, param_filter.head_pose, valid=False)
+                face_streamed = False
+        else:
             mp_scores = result.face_blendshapes[0]
             
             # Translate blendshapes to FLAME coefficients
-            translation_result = translator.translate(mp_scores)
+            with profiler.span('translate'):
+                scores = translator.mediapipe_to_array(mp_scores)
+                translation_result = translator.translate_scores(scores)
             
             # Handle both return formats (with/without mappings)
             if len(translation_result) == 3:
@@ -79,52 +205,41 @@ def main():
                 jaw_pose = None
                 eye_pose = None
             
-            # Apply expression and pose to deform the mesh
-            deformed_vertices = translator.deform_mesh(flame_expr, jaw_pose)
+            # Head yaw/pitch/roll in the avatar's coordinate system
+            with profiler.span('head_pose'):
+                head_pose = solve_head_pose(head_pose_solver, result)
 
-            # Get head rotation from landmarks
-            landmarks = result.face_landmarks[0]
-            raw_yaw, raw_pitch = get_head_rotation(landmarks)
+            if recorder is not None:
+                with profiler.span('record'):
+                    recorder.write(timestamp, True, scores, result.face_landmarks[0],
+                                   flame_expr, jaw_pose, eye_pose, head_pose)
 
-            # Invert yaw for FLAME coordinate system
-            yaw = -raw_yaw
-            pitch = raw_pitch
-            
-            # Rotation Matrices
-            R_pitch = np.array([
-                [1, 0, 0],
-                [0, np.cos(pitch), -np.sin(pitch)],
-                [0, np.sin(pitch), np.cos(pitch)]
-            ])
-            R_yaw = np.array([
-                [np.cos(yaw), 0, np.sin(yaw)],
-                [0, 1, 0],
-                [-np.sin(yaw), 0, np.cos(yaw)]
-            ])
-
-            # Base orientation corrections for FLAME model
-            R_z = np.array([
-                [np.cos(np.radians(180)), -np.sin(np.radians(180)), 0],
-                [np.sin(np.radians(180)), np.cos(np.radians(180)), 0],
-                [0, 0, 1]
-            ])
-
-            R_x = np.array([
-                [1, 0, 0],
-                [0, np.cos(np.radians(-35)), -np.sin(np.radians(-35))],
-                [0, np.sin(np.radians(-35)), np.cos(np.radians(-35))]
-            ])
+            # Smooth all channels; an unchanged face keeps the current mesh
+            with profiler.span('filter'):
+                changed = param_filter.update(timestamp / 1000, flame_expr, jaw_pose, eye_pose, head_pose)
+            flame_expr = param_filter.expression
+            jaw_pose = None if jaw_pose is None else param_filter.jaw_pose
+            eye_pose = None if eye_pose is None else param_filter.eye_pose
+            yaw, pitch, roll = param_filter.head_pose
 
-            
-            # Apply the transformations
-            deformed_vertices = deformed_vertices @ R_z.T @ R_x.T
-            deformed_vertices = deformed_vertices @ R_yaw.T @ R_pitch.T
-            
-            # Center the mesh
-            deformed_vertices -= np.mean(deformed_vertices, axis=0)
-            
-            # Update the avatar visualization
-            visualizer.update_mesh(deformed_vertices)
+            if changed:
+                if sender is not None:
+                    with profiler.span('stream'):
+                        sender.send(timestamp, flame_expr, jaw_pose, eye_pose, param_filter.head_pose)
+                    face_streamed = True
+
+                # Apply expression and pose to deform the mesh
+                with profiler.span('deform'):
+                    deformed_vertices = deform(flame_expr, jaw_pose, eye_pose)
+
+                # Single composed head rotation, then center the mesh in place
+                with profiler.span('pose'):
+                    head_rotation(param_filter.head_pose, rotation)
+                    posed_vertices = translator.transform_mesh(deformed_vertices, rotation)
+
+                # Update the avatar visualization
+                with profiler.span('render'):
+                    visualizer.update_mesh(posed_vertices)
             
             # Debug
             if frame_count % 30 == 0: 
@@ -134,21 +249,712 @@ def main():
                     print(f"Jaw pose: [{jaw_pose[0]:.3f}, {jaw_pose[1]:.3f}, {jaw_pose[2]:.3f}]")
                 if eye_pose is not None:
                     print(f"Eye pose: [{eye_pose[0]:.3f}, {eye_pose[1]:.3f}, ...]")
-                print(f"Head rotation: yaw={yaw:.3f}, pitch={pitch:.3f}")
+                print(f"Head rotation: yaw={yaw:.3f}, pitch={pitch:.3f}, roll={roll:.3f}")
                 
                 # Show active expressions
                 active_expr = np.where(np.abs(flame_expr) > 0.1)[0]
                 if len(active_expr) > 0:
                     print(f"Active expressions: {active_expr[:5]}...")
+                if param_filter.skipped:
+                    print(f"Unchanged frames skipped: {param_filter.skipped}")
+                if args.live_stream:
+                    print("Live stream: {submitted} detected, {dropped} frames dropped, "
+                          "{unused_results} results unused, {latency_ms:.1f} ms latency".format(**detector.stats()))
+                if profiler.enabled:
+                    print(profiler.report())
 
         # Show the video feed
-        cv2.imshow('Avatar Driver Pipeline', frame)
-        if cv2.waitKey(1) & 0xFF == ord('q'):
+        with profiler.span('display'):
+            # An update held back by --render-fps is drawn once it is due
+            visualizer.render_pending()
+            if args.profile_overlay:
+                profiler.draw_overlay(frame)
+            cv2.imshow('Avatar Driver Pipeline', frame)
+            key = cv2.waitKey(1) & 0xFF
+        profiler.end_frame()
+        if key == ord('q'):
             break
+        if key == ord('c'):
+            head_pose_solver.reset()
 
     cap.release()
+    detector.close()
     cv2.destroyAllWindows()
+    profiler.close()
+    close_sender(sender, time.perf_counter() - start_time)
+    if args.live_stream:
+        stats = detector.stats()
+        print(f"✓ Live stream: {stats['dropped']} of {stats['dropped'] + stats['submitted']} frames dropped "
+              f"while detection was busy")
+    if recorder is not None:
+        recorder.close()
+        print(f"✓ Recorded {recorder.num_frames} frames to: {args.record}")
     print("\n=== Session ended ===")
+    if profiler.enabled:
+        print(profiler.report())
+
+def run_multi_face(args):
+    """
+    Live driver for up to args.num_faces people in one stream.
+
+    Detections keep stable avatar slots through FaceTracker. All faces are
+    translated, deformed and posed with one batched call each, and drawn as
+    one merged mesh.
+    """
+    num_faces = args.num_faces
+    print("--- Initializing FLAME Translator ---")
+    translator = FlameTranslator(args.flame, mappings_path=args.mappings, dtype=FLAME_DTYPE)
+    visualizer = Visualizer(translator.faces, num_meshes=num_faces, max_fps=args.render_fps,
+                            num_vertices=translator.v_template.shape[0])
+    detector = create_detector(args.model, num_faces=num_faces,
+                               transformation_matrixes=args.head_pose == 'matrix')
+    tracker = FaceTracker(num_faces)
+
+    # Per-slot state, reused every frame
+    num_vertices = translator.v_template.shape[0]
+    scores = np.zeros((num_faces, len(BLENDSHAPE_NAMES)))
+    head_poses = np.zeros((num_faces, 3))
+    rotations = np.tile(np.eye(3), (num_faces, 1, 1))
+    deformed_vertices = np.empty((num_faces, num_vertices, 3), dtype=translator.dtype)
+    posed_vertices = np.empty_like(deformed_vertices)
+    param_filters = [create_parameter_filter(args) for _ in range(num_faces)]
+    # Every slot streams as its own avatar id
+    sender = create_sender(args, num_avatars=num_faces)
+    streamed = np.zeros(num_faces, dtype=bool)
+
+    cap = cv2.VideoCapture(args.video)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    frame_source = create_frame_source(args, cap)
+    frame_count = 0
+    profiler = create_profiler(args, fps)
+    # One solver per slot; a new identity in a slot gets a new kabsch reference
+    head_pose_solvers = [create_head_pose(args, cap) for _ in range(num_faces)]
+    solver_track_ids = np.full(num_faces, -1)
+
+    print(f"\nStarting Multi-Face FLAME Avatar Driver ({num_faces} faces)")
+    print(f"FPS: {fps}")
+    print("Press 'q' to quit\n")
+
+    start_time = time.perf_counter()
+    while cap.isOpened():
+        with profiler.span('capture'):
+            frame = frame_source.read()
+        if frame is None:
+            break
+        with profiler.span('convert'):
+            detection_image, crop = frame_source.detection_frame(frame)
+            rgb_frame = mp.Image(image_format=mp.ImageFormat.SRGB, data=detection_image)
+        timestamp = int(1000 * frame_source.index / fps)
+        frame_count += 1
+
+        with profiler.span('detect'):
+            result = frame_source.map_result(detector.detect_for_video(rgb_frame, timestamp), crop)
+        # Per face: tracking slot and blendshape scores, then head pose
+        with profiler.span('faces'):
+            slots = tracker.update([face_centroid(landmarks) for landmarks in result.face_landmarks])
+            for detection, slot in enumerate(slots):
+                if slot < 0:
+                    continue
+                translator.mediapipe_to_array(result.face_blendshapes[detection], out=scores[slot])
+        with profiler.span('head_pose'):
+            for detection, slot in enumerate(slots):
+                if slot < 0:
+                    continue
+                if solver_track_ids[slot] != tracker.track_ids[slot]:
+                    head_pose_solvers[slot].reset()
+                    solver_track_ids[slot] = tracker.track_ids[slot]
+                head_poses[slot] = solve_head_pose(head_pose_solvers[slot], result, detection)
+
+        if tracker.active.any():
+            with profiler.span('translate'):
+                flame_expr, jaw_pose, eye_pose = translator.translate_batch(scores)
+            with profiler.span('filter'):
+                for slot, param_filter in enumerate(param_filters):
+                    if not tracker.active[slot]:
+                        param_filter.reset()
+                        continue
+                    changed = param_filter.update(timestamp / 1000, flame_expr[slot],
+                                                  None if jaw_pose is None else jaw_pose[slot],
+                                                  None if eye_pose is None else eye_pose[slot],
+                                                  head_poses[slot])
+                    if sender is not None and changed:
+                        sender.send(timestamp, param_filter.expression, param_filter.jaw_pose,
+                                    param_filter.eye_pose, param_filter.head_pose, avatar=slot)
+                        streamed[slot] = True
+                    flame_expr[slot] = param_filter.expression
+                    if jaw_pose is not None:
+                        jaw_pose[slot] = param_filter.jaw_pose
+                        eye_pose[slot] = param_filter.eye_pose
+                    head_rotation(param_filter.head_pose, rotations[slot])
+
+            # One batched call each for all faces
+            with profiler.span('deform'):
+                translator.deform_batch(flame_expr, jaw_pose, eye_pose, out=deformed_vertices)
+            with profiler.span('pose'):
+                translator.transform_batch(deformed_vertices, rotations, out=posed_vertices)
+            with profiler.span('render'):
+                visualizer.update_mesh(posed_vertices, active=tracker.active)
+
+        if sender is not None:
+            # Slots whose face left since they last streamed
+            for slot in np.flatnonzero(streamed & ~tracker.active):
+                param_filter = param_filters[slot]
+                sender.send(timestamp, param_filter.expression, param_filter.jaw_pose,
+                            param_filter.eye_pose, param_filter.head_pose, valid=False, avatar=slot)
+                streamed[slot] = False
+
+        if frame_count % 30 == 0:
+            elapsed = time.perf_counter() - start_time
+            tracks = ", ".join(f"slot {slot}: id {tracker.track_ids[slot]}"
+                               for slot in np.flatnonzero(tracker.active))
+            print(f"Frame {frame_count}: {frame_count / elapsed:.1f} FPS, {tracker.active.sum()} faces ({tracks})")
+            if profiler.enabled:
+                print(profiler.report())
+
+        with profiler.span('display'):
+            # An update held back by --render-fps is drawn once it is due
+            visualizer.render_pending()
+            if args.profile_overlay:
+                profiler.draw_overlay(frame)
+            cv2.imshow('Avatar Driver Pipeline', frame)
+            key = cv2.waitKey(1) & 0xFF
+        profiler.end_frame()
+        if key == ord('q'):
+            break
+
+    cap.release()
+    detector.close()
+    cv2.destroyAllWindows()
+    profiler.close()
+    close_sender(sender, time.perf_counter() - start_time)
+    print("\n=== Session ended ===")
+    if profiler.enabled:
+        print(profiler.report())
+
+def export_video(cap, detector, translator, exporter, fps, first_frame=0, num_frames=None,
+                 detector_clock=0, video_writer=None, recorder=None, head_pose_solver=None,
+                 param_filter=None, deform=None, frame_source=None, progress_every=300):
+    """
+    Run detection and translation over frames read from `cap` and append
+    them to `exporter`. Frames without a detected face repeat the previous
+    parameters and are flagged with valid=False. The exported parameters
+    are the filtered ones, matching the exported and rendered mesh.
+
+    Args:
+        cap: Opened cv2.VideoCapture, positioned at `first_frame`
+        detector: FaceLandmarker in VIDEO mode
+        translator: FlameTranslator
+        exporter: ParameterExporter receiving one row per frame
+        fps: Source frame rate, used for the exported timestamps
+        first_frame: Index of the first frame read, for timestamps
+        num_frames: Stop after this many source frames (None = until the end)
+        detector_clock: Offset (ms) added to detector timestamps, which must
+            increase monotonically across calls on one landmarker
+        video_writer: Optional MeshVideoWriter for an off-screen render
+        recorder: Optional RecordingWriter receiving the tracking results
+        head_pose_solver: HeadPoseSolver (default: the 'landmarks' method)
+        param_filter: ParameterFilter (default: no smoothing); frames it
+            reports as unchanged keep the previous mesh
+        deform: Deformation function with translator.deform_mesh's signature,
+            e.g. from create_deformer (default: translator.deform_mesh)
+        frame_source: FrameSource reading `cap` from `first_frame` (default:
+            every frame at full resolution), for downscaled, cropped or
+            strided input
+        progress_every: Frames between progress lines (0 = quiet)
+
+    Returns:
+        Number of frames processed
+    """
+    head_pose_solver = head_pose_solver or HeadPoseSolver()
+    param_filter = param_filter or create_filter()
+    deform = deform or translator.deform_mesh
+    frame_source = frame_source or FrameSource(cap, first_frame=first_frame)
+    rotation = np.empty((3, 3))
+    flame_expr = np.zeros(translator.expression_basis.shape[1])
+    jaw_pose = None
+    eye_pose = None
+    head_pose = np.zeros(3)
+    posed_vertices = translator.transform_mesh(translator.deform_mesh(flame_expr), np.eye(3))
+
+    frame_count = 0
+    start_time = time.perf_counter()
+    while True:
+        frame = frame_source.read()
+        if frame is None or (num_frames is not None and frame_source.index - first_frame >= num_frames):
+            break
+
+        detection_image, crop = frame_source.detection_frame(frame)
+        rgb_frame = mp.Image(image_format=mp.ImageFormat.SRGB, data=detection_image)
+        timestamp = int(1000 * frame_source.index / fps)
+        frame_count += 1
+
+        result = detector.detect_for_video(rgb_frame, detector_clock + timestamp)
+        frame_source.map_result(result, crop)
+        valid = bool(result.face_blendshapes)
+        if valid:
+            scores = translator.mediapipe_to_array(result.face_blendshapes[0])
+            flame_expr, jaw_pose, eye_pose = translator.translate_scores(scores)
+            head_pose = solve_head_pose(head_pose_solver, result)
+            if recorder is not None:
+                recorder.write(timestamp, True, scores, result.face_landmarks[0],
+                               flame_expr, jaw_pose, eye_pose, head_pose)
+
+            changed = param_filter.update(timestamp / 1000, flame_expr, jaw_pose, eye_pose, head_pose)
+            flame_expr = param_filter.expression
+            jaw_pose = None if jaw_pose is None else param_filter.jaw_pose
+            eye_pose = None if eye_pose is None else param_filter.eye_pose
+            head_pose = param_filter.head_pose
+            if changed:
+                deformed_vertices = deform(flame_expr, jaw_pose, eye_pose)
+                head_rotation(head_pose, rotation)
+                posed_vertices = translator.transform_mesh(deformed_vertices, rotation)
+        else:
+            param_filter.reset()
+            if recorder is not None:
+                recorder.write(timestamp, False)
+
+        exporter.write(timestamp, valid, flame_expr, jaw_pose, eye_pose, head_pose, posed_vertices)
+        if video_writer is not None:
+            video_writer.visualizer.update_mesh(posed_vertices)
+            video_writer.write_frame()
+
+        if progress_every and frame_count % progress_every == 0:
+            elapsed = time.perf_counter() - start_time
+            print(f"Frame {frame_source.index + 1} ({frame_count / elapsed:.1f} FPS)")
+    return frame_count
+
+def run_headless(args):
+    """
+    Process a video without opening any window and stream the results to disk.
+
+    Writes per-frame FLAME parameters (and optionally a vertex cache) into
+    args.output as .npy files, plus an off-screen rendered MP4 if args.render
+    is set and a recording for --replay if args.record is set.
+    """
+    print("--- Initializing FLAME Translator ---")
+    translator = FlameTranslator(args.flame, mappings_path=args.mappings, dtype=FLAME_DTYPE)
+    detector = create_detector(args.model, transformation_matrixes=args.head_pose == 'matrix')
+
+    cap = cv2.VideoCapture(args.video)
+    if not cap.isOpened():
+        raise IOError(f"Cannot open video: {args.video}")
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+
+    exporter = ParameterExporter(args.output, save_vertices=args.vertices,
+                                 num_vertices=translator.v_template.shape[0])
+    video_writer = None
+    if args.render:
+        visualizer = Visualizer(translator.faces, off_screen=True, num_vertices=translator.v_template.shape[0])
+        video_writer = MeshVideoWriter(args.render, visualizer, fps)
+    recorder = create_recorder(args, cap)
+    param_filter = create_parameter_filter(args)
+
+    print(f"\nExporting {args.video} -> {args.output}")
+    print(f"FPS: {fps}, frames: {total_frames}" +
+          (f", every {args.frame_stride}th frame" if args.frame_stride > 1 else "") + "\n")
+
+    start_time = time.perf_counter()
+    try:
+        frame_count = export_video(cap, detector, translator, exporter, fps,
+                                   video_writer=video_writer, recorder=recorder,
+                                   head_pose_solver=create_head_pose(args, cap),
+                                   param_filter=param_filter,
+                                   deform=create_deformer(translator, args),
+                                   frame_source=create_frame_source(args, cap))
+    finally:
+        cap.release()
+        detector.close()
+        exporter.close()
+        if video_writer is not None:
+            video_writer.close()
+        if recorder is not None:
+            recorder.close()
+
+    elapsed = time.perf_counter() - start_time
+    print(f"\n=== Export finished: {frame_count} frames in {elapsed:.1f}s ===")
+    if param_filter.skipped:
+        print(f"✓ Unchanged frames skipped: {param_filter.skipped}")
+
+def run_replay(args):
+    """
+    Drive the avatar from a recording instead of a video.
+
+    The recorded blendshape scores are translated again with the current
+    mappings, so mapping changes can be tried without re-running MediaPipe.
+    Head poses are solved again from the stored landmarks in one batch
+    (except with --head-pose matrix, whose matrices are not recorded).
+    Frames are paced by their recorded timestamps, scaled by
+    args.replay_speed (0 = as fast as possible).
+    """
+    recording = Recording(args.replay)
+    if not len(recording):
+        raise ValueError(f"Recording is empty: {args.replay}")
+
+    print("--- Initializing FLAME Translator ---")
+    translator = FlameTranslator(args.flame, mappings_path=args.mappings, dtype=FLAME_DTYPE)
+    visualizer = Visualizer(translator.faces, max_fps=args.render_fps,
+                            num_vertices=translator.v_template.shape[0])
+
+    # Reused every frame so the mesh path allocates nothing
+    scores = np.zeros(len(BLENDSHAPE_NAMES))
+    rotation = np.empty((3, 3))
+    param_filter = create_parameter_filter(args)
+    deform = create_deformer(translator, args)
+    sender = create_sender(args)
+
+    first_frame = recording.seek(recording.timestamps[0] + int(1000 * args.replay_start))
+    first_timestamp = int(recording.timestamps[first_frame])
+
+    head_poses = recording.head_pose
+    valid_frames = np.flatnonzero(recording.valid[first_frame:])
+    if args.head_pose != 'matrix' and len(valid_frames):
+        # Landmarks are stored normalized; 'kabsch' needs the source aspect ratio
+        aspect_ratio = args.aspect_ratio or recording.aspect_ratio
+        if aspect_ratio is None:
+            aspect_ratio = 1.0
+            if args.head_pose == 'kabsch':
+                print("⚠ The recording does not store its frame aspect ratio; assuming 1.0 "
+                      "(set it with --aspect-ratio)")
+        head_pose_solver = HeadPoseSolver(args.head_pose, aspect_ratio=aspect_ratio)
+        head_pose_solver(recording.landmarks[first_frame + valid_frames[0]])
+        head_poses = np.zeros((len(recording), 3))
+        for start in range(first_frame, len(recording), REPLAY_POSE_CHUNK):
+            stop = min(start + REPLAY_POSE_CHUNK, len(recording))
+            head_poses[start:stop] = head_pose_solver.solve_batch(recording.landmarks[start:stop])
+
+    print(f"\nReplaying {args.replay}: {len(recording)} frames, {recording.duration:.1f}s")
+    print(f"Starting at {args.replay_start:.1f}s (frame {first_frame}), speed {args.replay_speed}x\n")
+
+    rendered = 0
+    face_streamed = False
+    start_time = time.perf_counter()
+    for index in range(first_frame, len(recording)):
+        timestamp = int(recording.timestamps[index])
+        if args.replay_speed > 0:
+            delay = (timestamp - first_timestamp) / 1000 / args.replay_speed - (time.perf_counter() - start_time)
+            if delay > 0:
+                time.sleep(delay)
+        # An update held back by --render-fps is drawn once it is due
+        visualizer.render_pending()
+
+        if not recording.valid[index]:
+            param_filter.reset()
+            if sender is not None and face_streamed:
+                sender.send(timestamp, param_filter.expression, param_filter.jaw_pose,
+                            param_filter.eye_pose, param_filter.head_pose, valid=False)
+                face_streamed = False
+            continue
+
+        np.copyto(scores, recording.scores[index])
+        flame_expr, jaw_pose, eye_pose = translator.translate_scores(scores)
+        if param_filter.update(timestamp / 1000, flame_expr, jaw_pose, eye_pose, head_poses[index]):
+            if sender is not None:
+                sender.send(timestamp, param_filter.expression,
+                            None if jaw_pose is None else param_filter.jaw_pose,
+                            None if eye_pose is None else param_filter.eye_pose, param_filter.head_pose)
+                face_streamed = True
+            deformed_vertices = deform(
+                param_filter.expression,
+                None if jaw_pose is None else param_filter.jaw_pose,
+                None if eye_pose is None else param_filter.eye_pose)
+            head_rotation(param_filter.head_pose, rotation)
+            visualizer.update_mesh(translator.transform_mesh(deformed_vertices, rotation))
+
+        rendered += 1
+        if rendered % 120 == 0:
+            elapsed = time.perf_counter() - start_time
+            print(f"Frame {index + 1}/{len(recording)}: {rendered / elapsed:.1f} FPS")
+
+    elapsed = time.perf_counter() - start_time
+    close_sender(sender, elapsed)
+    print(f"\n=== Replay finished: {rendered} frames in {elapsed:.1f}s ===")
+
+def run_pipelined(args):
+    """
+    Live driver split into capture, detect and translate threads feeding the
+    render loop on the main thread (where OpenCV/VTK windows must live).
+
+    Stages are connected by bounded queues: lossless for files, drop-oldest
+    for webcams so latency stays bounded when a stage falls behind.
+    """
+    print("--- Initializing FLAME Translator ---")
+    translator = FlameTranslator(args.flame, mappings_path=args.mappings, dtype=FLAME_DTYPE)
+    visualizer = Visualizer(translator.model['f'], max_fps=args.render_fps,
+                            num_vertices=translator.v_template.shape[0])
+    detector = create_detector(args.model, transformation_matrixes=args.head_pose == 'matrix')
+
+    cap = cv2.VideoCapture(args.video)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    frame_source = create_frame_source(args, cap, num_buffers=0)
+    head_pose_solver = create_head_pose(args, cap)
+    policy = args.queue_policy
+    if policy == 'auto':
+        policy = 'drop_oldest' if isinstance(args.video, int) else 'block'
+
+    # Buffers go back to their pool once shown or dropped, never in turn:
+    # under drop_oldest the producers can run any number of frames ahead of
+    # the one being rendered. A frame is in flight while queued before any
+    # of the three stages or being read, detected, translated or shown; a
+    # mesh while queued or being posed or rendered. Frame buffers are
+    # allocated by the first reads, when the frame size is known
+    frame_pool = BufferPool([None] * (3 * args.queue_size + 4))
+    num_vertices = translator.v_template.shape[0]
+    vertex_pool = BufferPool([np.empty((num_vertices, 3), dtype=translator.dtype)
+                              for _ in range(args.queue_size + 2)])
+    rotation = np.empty((3, 3))
+    param_filter = create_parameter_filter(args)
+    deform = create_deformer(translator, args)
+
+    def capture():
+        frame = frame_source.read(frame_pool.acquire())
+        if frame is None:
+            return None
+        return frame_source.index, int(1000 * frame_source.index / fps), frame
+
+    def detect(item):
+        # The ROI is only read and moved here, on the detect thread
+        index, timestamp, frame = item
+        detection_image, crop = frame_source.detection_frame(frame)
+        rgb_frame = mp.Image(image_format=mp.ImageFormat.SRGB, data=detection_image)
+        result = detector.detect_for_video(rgb_frame, timestamp)
+        return index, frame, frame_source.map_result(result, crop)
+
+    def translate(item):
+        # A None mesh tells the render loop to keep the current one
+        index, frame, result = item
+        if not result.face_blendshapes:
+            param_filter.reset()
+            return index, frame, None
+        flame_expr, jaw_pose, eye_pose = translator.translate(result.face_blendshapes[0])
+        head_pose = solve_head_pose(head_pose_solver, result)
+        if not param_filter.update(index / fps, flame_expr, jaw_pose, eye_pose, head_pose):
+            return index, frame, None
+        deformed_vertices = deform(
+            param_filter.expression,
+            None if jaw_pose is None else param_filter.jaw_pose,
+            None if eye_pose is None else param_filter.eye_pose)
+        head_rotation(param_filter.head_pose, rotation)
+        posed_vertices = translator.transform_mesh(deformed_vertices, rotation, out=vertex_pool.acquire())
+        return index, frame, posed_vertices
+
+    def release(item):
+        # Called once a translated item is shown or dropped
+        _, frame, posed_vertices = item
+        frame_pool.release(frame)
+        if posed_vertices is not None:
+            vertex_pool.release(posed_vertices)
+
+    pipeline = Pipeline(queue_size=args.queue_size, policy=policy)
+    pipeline.add_stage('capture', capture, on_drop=lambda item: frame_pool.release(item[2]))
+    pipeline.add_stage('detect', detect, on_drop=lambda item: frame_pool.release(item[1]))
+    pipeline.add_stage('translate', translate, on_drop=release)
+
+    print("\nStarting Pipelined FLAME Avatar Driver")
+    print(f"FPS: {fps}, queue policy: {policy}")
+    print("Press 'q' to quit\n")
+
+    rendered = 0
+    start_time = time.perf_counter()
+    pipeline.start()
+    try:
+        for item in pipeline.output:
+            index, frame, posed_vertices = item
+            render_start = time.perf_counter()
+            if posed_vertices is not None:
+                visualizer.update_mesh(posed_vertices)
+            else:
+                # An update held back by --render-fps is drawn once it is due
+                visualizer.render_pending()
+            cv2.imshow('Avatar Driver Pipeline', frame)
+            # Both are copied into the windows, so the buffers can be reused
+            release(item)
+            key = cv2.waitKey(1) & 0xFF
+            pipeline.record('render', time.perf_counter() - render_start)
+
+            rendered += 1
+            if rendered % 120 == 0:
+                elapsed = time.perf_counter() - start_time
+                print(f"Frame {index + 1}: {rendered / elapsed:.1f} FPS rendered (source {fps:.1f})")
+                print(pipeline.report())
+            if key == ord('q'):
+                break
+    finally:
+        try:
+            pipeline.stop()
+            pipeline.join()
+        finally:
+            cap.release()
+            detector.close()
+            cv2.destroyAllWindows()
+
+    print("\n=== Session ended ===")
+    print(pipeline.report())
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Drive a FLAME avatar from MediaPipe face tracking.")
+    parser.add_argument('--video', default=VIDEO_PATH,
+                        help="Video file, or a webcam index such as 0")
+    parser.add_argument('--model', default=MODEL_PATH, help="MediaPipe face_landmarker.task")
+    parser.add_argument('--flame', default=FLAME_PATH, help="FLAME generic_model.pkl")
+    parser.add_argument('--mappings', default=MAPPINGS_PATH, help="Folder with mapping .npy files")
+    parser.add_argument('--num-faces', type=int, default=1,
+                        help="Track and drive up to this many faces, one avatar each")
+    parser.add_argument('--render-fps', type=float, metavar='FPS',
+                        help="Cap avatar rendering at this rate; tracking keeps running at full speed")
+    parser.add_argument('--live-stream', action='store_true',
+                        help="Detect asynchronously (MediaPipe LIVE_STREAM) and always render the newest "
+                             "result; frames arriving while detection is busy are dropped")
+    parser.add_argument('--head-pose', choices=HEAD_POSE_METHODS, default='landmarks',
+                        help="Head pose from nose/eye landmarks (yaw, pitch), a least-squares 'kabsch' "
+                             "fit of rigid landmarks, or MediaPipe's transformation 'matrix'")
+
+    source = parser.add_argument_group('input')
+    source.add_argument('--detect-size', type=int, default=None, metavar='PIXELS',
+                        help="Downscale frames more than 4x larger so detection runs on this many pixels "
+                             "along the longest side (e.g. 640); landmarks stay in full-frame coordinates")
+    source.add_argument('--roi', action='store_true',
+                        help="Detect on a crop around the last face instead of the whole frame")
+    source.add_argument('--roi-margin', type=float, default=0.5,
+                        help="Space around the face in the --roi crop, relative to the face size")
+    source.add_argument('--frame-stride', type=int, default=1, metavar='N',
+                        help="Headless export: process every N-th frame only")
+
+    profiling = parser.add_argument_group('profiling')
+    profiling.add_argument('--profile', action='store_true',
+                           help="Time each stage and print rolling p50/p95/p99 latencies")
+    profiling.add_argument('--profile-overlay', action='store_true',
+                           help="Draw FPS and stage latencies onto the video window")
+    profiling.add_argument('--profile-log', metavar='PATH',
+                           help="Write per-frame stage timings to a .csv or .jsonl file")
+
+    headless = parser.add_argument_group('headless export')
+    headless.add_argument('--headless', action='store_true',
+                          help="Process the video without any window and write results to --output")
+    headless.add_argument('--output', default='output',
+                          help="Directory for the per-frame parameter .npy files")
+    headless.add_argument('--vertices', action='store_true',
+                          help="Also write vertices.npy, a (N, 5023, 3) float32 vertex cache")
+    headless.add_argument('--render', metavar='MP4',
+                          help="Also render the avatar off-screen into this MP4 file")
+
+    filtering = parser.add_argument_group('temporal filtering')
+    filtering.add_argument('--filter', choices=FILTERS, default='none',
+                           help="Smooth expression, jaw, eye and head channels over time")
+    filtering.add_argument('--min-cutoff', type=float, default=1.0,
+                           help="One-Euro cutoff (Hz) at rest; lower is smoother")
+    filtering.add_argument('--beta', type=float, default=5.0,
+                           help="One-Euro speed coefficient; higher reduces lag on fast motion")
+    filtering.add_argument('--process-noise', type=float, default=1000.0,
+                           help="Kalman acceleration variance; higher follows changes faster")
+    filtering.add_argument('--measurement-noise', type=float, default=1e-3,
+                           help="Kalman measurement variance; higher is smoother")
+    filtering.add_argument('--change-threshold', type=float, default=0.0,
+                           help="Skip deformation and rendering while no filtered channel "
+                                "moves by more than this")
+
+    deformation = parser.add_argument_group('incremental deformation')
+    deformation.add_argument('--incremental', action='store_true',
+                             help="Only apply the basis columns of expression components that changed")
+    deformation.add_argument('--incremental-epsilon', type=float, default=1e-3,
+                             help="Coefficient change below which a component is not updated")
+    deformation.add_argument('--region-tolerance', type=float, default=None,
+                             help="Also restrict each component to vertices it moves by more than "
+                                  "this (metres per unit coefficient)")
+
+    low_rank = parser.add_argument_group('low-rank deformation')
+    low_rank.add_argument('--rank', type=int, default=None,
+                          help="Precompose mapping and basis, truncated to this many components "
+                               "(0 = no truncation)")
+    low_rank.add_argument('--max-error-mm', type=float, default=None,
+                          help="Instead of --rank, use the fewest components within this vertex error")
+
+    recording = parser.add_argument_group('recording and replay')
+    recording.add_argument('--record', metavar='PATH',
+                           help="Save timestamps, blendshapes, landmarks and FLAME parameters "
+                                "of every frame (e.g. session.rec.npy)")
+    recording.add_argument('--record-append', action='store_true',
+                           help="Append to an existing --record file instead of replacing it")
+    recording.add_argument('--replay', metavar='PATH',
+                           help="Drive the avatar from a recording instead of running MediaPipe")
+    recording.add_argument('--replay-start', type=float, default=0.0, metavar='SECONDS',
+                           help="Start the replay this far into the recording")
+    recording.add_argument('--replay-speed', type=float, default=1.0,
+                           help="Playback speed relative to the recorded timestamps (0 = unthrottled)")
+    recording.add_argument('--aspect-ratio', type=float, default=None, metavar='RATIO',
+                           help="Frame width / height of the recorded video (e.g. 1.778), for "
+                                "re-solving head poses (default: stored with the recording)")
+
+    streaming = parser.add_argument_group('parameter streaming')
+    streaming.add_argument('--stream', metavar='HOST:PORT',
+                           help="Send every frame's FLAME parameters over UDP to a remote renderer "
+                                "(see tools/param_receiver.py)")
+    streaming.add_argument('--stream-encoding', choices=list(STREAM_ENCODINGS), default='float16',
+                           help="Value encoding: float32, float16, or int16 scaled per packet")
+    streaming.add_argument('--stream-delta', action='store_true',
+                           help="Send differences to the last keyframe between keyframes")
+    streaming.add_argument('--stream-keyframe-interval', type=int, default=30, metavar='PACKETS',
+                           help="Packets between keyframes with --stream-delta")
+    streaming.add_argument('--stream-threshold', type=float, default=0.0,
+                           help="With --stream-delta, leave out channels that moved less than this "
+                                "since the keyframe")
+
+    pipelined = parser.add_argument_group('pipelined live mode')
+    pipelined.add_argument('--pipelined', action='store_true',
+                           help="Run capture, detection and translation on separate threads")
+    pipelined.add_argument('--queue-size', type=int, default=2,
+                           help="Capacity of each queue between stages")
+    pipelined.add_argument('--queue-policy', choices=['auto', 'block', 'drop_oldest'], default='auto',
+                           help="Backpressure: lossless 'block', or 'drop_oldest' (default for webcams)")
+
+    args = parser.parse_args(argv)
+    if args.incremental and (args.rank is not None or args.max_error_mm is not None):
+        parser.error("--incremental cannot be combined with --rank/--max-error-mm")
+    if args.rank is not None and args.rank < 0:
+        parser.error("--rank must be at least 0")
+    if args.max_error_mm is not None and args.max_error_mm <= 0:
+        parser.error("--max-error-mm must be positive")
+    if args.num_faces > 1 and (args.headless or args.pipelined):
+        parser.error("--num-faces > 1 is only supported by the live driver")
+    if args.num_faces > 1 and (args.incremental or args.rank is not None or args.max_error_mm is not None):
+        parser.error("--num-faces > 1 deforms all faces in one batch and cannot be combined with "
+                     "--incremental, --rank or --max-error-mm")
+    if args.replay and (args.headless or args.pipelined or args.record or args.num_faces > 1):
+        parser.error("--replay cannot be combined with --headless, --pipelined, --record or --num-faces")
+    if args.aspect_ratio is not None and (args.aspect_ratio <= 0 or not args.replay):
+        parser.error("--aspect-ratio must be positive and is only used by --replay")
+    if args.record and (args.pipelined or args.num_faces > 1):
+        parser.error("--record is only supported by the live and headless drivers")
+    if args.live_stream and (args.headless or args.pipelined or args.replay or args.num_faces > 1):
+        parser.error("--live-stream is only supported by the single-face live driver")
+    if args.stream and (args.headless or args.pipelined):
+        parser.error("--stream is only supported by the live, multi-face and replay drivers")
+    if args.stream_keyframe_interval < 1:
+        parser.error("--stream-keyframe-interval must be at least 1")
+    if args.roi and (args.num_faces > 1 or args.live_stream):
+        parser.error("--roi tracks a single face and cannot be combined with --num-faces or --live-stream")
+    if args.frame_stride < 1 or (args.frame_stride > 1 and not args.headless):
+        parser.error("--frame-stride must be at least 1 and is only supported by --headless")
+    if args.detect_size is not None and args.detect_size <= 0:
+        parser.error("--detect-size must be positive")
+    if args.render_fps is not None and args.render_fps <= 0:
+        parser.error("--render-fps must be positive")
+    if args.video.isdigit():
+        args.video = int(args.video)
+    return args
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.replay:
+        run_replay(args)
+    elif args.headless:
+        run_headless(args)
+    elif args.pipelined:
+        run_pipelined(args)
+    elif args.num_faces > 1:
+        run_multi_face(args)
+    else:
+        run_live(args)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
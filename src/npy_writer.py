@@ -0,0 +1,122 @@
+import os
+
+import numpy as np
+
+NPY_MAGIC = b'\x93NUMPY\x01\x00'
+
+# Fixed header size so the row count can be rewritten in place without
+# moving the data that follows it
+HEADER_SIZE = 256
+
+
+def _npy_header(shape, dtype, header_size=HEADER_SIZE):
+    header = repr({
+        'descr': np.lib.format.dtype_to_descr(np.dtype(dtype)),
+        'fortran_order': False,
+        'shape': tuple(shape),
+    })
+    header_len = header_size - len(NPY_MAGIC) - 2
+    if len(header) + 1 > header_len:
+        raise ValueError(f"Row shape {shape[1:]} is too large for a {header_size}-byte .npy header")
+    header = header.ljust(header_len - 1) + '\n'
+    return NPY_MAGIC + header_len.to_bytes(2, 'little') + header.encode('latin1')
+
+
+class NpyAppendWriter:
+    """
+    Append rows to a standard .npy file on disk without holding them in memory.
+
+    The header is rewritten with the current row count on every flush(), so
+    the file can be opened with np.load(path, mmap_mode='r') while it is
+    still growing and remains readable up to the last flush after a crash.
+    """
+
+    def __init__(self, path, row_shape=(), dtype=np.float32, flush_every=256,
+                 append=False, header_size=HEADER_SIZE):
+        """
+        Args:
+            path: Output .npy path
+            row_shape: Shape of one row, e.g. (100,) or (5023, 3)
+            dtype: Element dtype stored on disk
+            flush_every: Rows between automatic header updates
+            append: Continue an existing file written with the same row
+                shape, dtype and header size instead of truncating it
+            header_size: Bytes reserved for the header, a multiple of 64;
+                raise it for long structured dtypes
+        """
+        self.path = path
+        self.row_shape = tuple(row_shape)
+        self.dtype = np.dtype(dtype)
+        self.flush_every = flush_every
+        self.header_size = header_size
+        self.num_rows = 0
+        self._rows_since_flush = 0
+
+        if append and os.path.exists(path):
+            self._file = open(path, 'r+b')
+            self._resume()
+        else:
+            self._file = open(path, 'wb')
+            self._file.write(_npy_header((0,) + self.row_shape, self.dtype, header_size))
+
+    def _resume(self):
+        """Pick up after the last complete row of an existing file."""
+        if np.lib.format.read_magic(self._file) != (1, 0):
+            self._file.close()
+            raise ValueError(f"Cannot append to {self.path}: not written by NpyAppendWriter")
+        shape, _, dtype = np.lib.format.read_array_header_1_0(self._file)
+        if (self._file.tell() != self.header_size or tuple(shape[1:]) != self.row_shape
+                or dtype != self.dtype):
+            self._file.close()
+            raise ValueError(f"Cannot append to {self.path}: it holds {shape[1:]} {dtype} rows")
+        # Rows written after the last header update (e.g. before a crash)
+        # are kept as long as they are complete
+        row_bytes = self.dtype.itemsize * int(np.prod(self.row_shape, dtype=np.int64))
+        data_bytes = os.fstat(self._file.fileno()).st_size - self.header_size
+        self.num_rows = data_bytes // row_bytes
+        self._file.truncate(self.header_size + self.num_rows * row_bytes)
+        self._file.seek(0, os.SEEK_END)
+
+    def append(self, row):
+        """Append a single row."""
+        row = np.asarray(row, dtype=self.dtype)
+        if row.shape != self.row_shape:
+            raise ValueError(f"Expected row shape {self.row_shape}, got {row.shape}")
+        self._file.write(np.ascontiguousarray(row).data)
+        self._advance(1)
+
+    def extend(self, rows):
+        """Append several rows at once, rows has shape (n,) + row_shape."""
+        rows = np.asarray(rows, dtype=self.dtype)
+        if rows.shape[1:] != self.row_shape:
+            raise ValueError(f"Expected row shape {self.row_shape}, got {rows.shape[1:]}")
+        self._file.write(np.ascontiguousarray(rows).data)
+        self._advance(len(rows))
+
+    def _advance(self, count):
+        self.num_rows += count
+        self._rows_since_flush += count
+        if self._rows_since_flush >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        """Write buffered data and update the row count in the header."""
+        self._file.flush()
+        self._file.seek(0)
+        self._file.write(_npy_header((self.num_rows,) + self.row_shape, self.dtype, self.header_size))
+        self._file.seek(0, os.SEEK_END)
+        self._file.flush()
+        self._rows_since_flush = 0
+
+    def close(self):
+        if self._file.closed:
+            return
+        self.flush()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
@@ -0,0 +1,327 @@
+import socket
+import struct
+
+import numpy as np
+
+from filters import CHANNELS
+
+# Packet layout (little-endian):
+#   header   HEADER.size (22) bytes: magic 'FL', version, encoding, flags,
+#            avatar id, sequence, reference sequence, timestamp (ms), scale
+#            of integer values
+#   mask     one bit per channel, delta packets with FLAG_MASK only
+#   values   the present channels, in CHANNELS order
+HEADER = struct.Struct('<2sBBBBIIIf')
+MAGIC = b'FL'
+VERSION = 1
+
+# Keyframe encodings; delta packets always carry int8 values
+ENCODINGS = {'float32': np.dtype('<f4'), 'float16': np.dtype('<f2'), 'int16': np.dtype('<i2')}
+DELTA_DTYPE = np.dtype('i1')
+_ENCODING_NAMES = list(ENCODINGS)
+
+FLAG_KEYFRAME = 1
+FLAG_VALID = 2      # a face was tracked; otherwise the receiver keeps its mesh
+FLAG_MASK = 4       # a channel mask follows the header
+
+NUM_PARAMS = sum(size for _, size in CHANNELS)
+MASK_BYTES = (NUM_PARAMS + 7) // 8
+MAX_PACKET = HEADER.size + MASK_BYTES + 4 * NUM_PARAMS
+
+DEFAULT_PORT = 9870
+
+
+def parse_address(address, default_host='127.0.0.1'):
+    """'host:port', ':port' or 'port' -> (host, port)."""
+    host, _, port = address.rpartition(':')
+    return host or default_host, int(port) if port else DEFAULT_PORT
+
+
+def _quantize(values, dtype, out, scratch):
+    """
+    Write `values` into `out` as `dtype`. Integer types are scaled by the
+    largest magnitude; returns the scale (1 for float types).
+    """
+    if dtype.kind == 'f':
+        out[:] = values
+        return 1.0
+    limit = np.iinfo(dtype).max
+    peak = float(np.abs(values).max()) if len(values) else 0.0
+    # Rounded to the header's float32 so both ends dequantize alike
+    scale = float(np.float32(peak / limit)) if peak > 0 else 1.0
+    np.divide(values, scale, out=scratch)
+    np.rint(scratch, out=scratch)
+    np.clip(scratch, -limit, limit, out=scratch)
+    out[:] = scratch
+    return scale
+
+
+def _dequantize(quantized, scale, out):
+    np.multiply(quantized, scale, out=out, casting='unsafe')
+    return out
+
+
+class ParameterEncoder:
+    """
+    Packs one avatar's per-frame FLAME parameters into compact packets.
+
+    Keyframes carry every channel in the chosen encoding ('int16' is scaled
+    per packet by the largest magnitude). With delta=True the packets
+    between keyframes carry int8 differences to the previous packet as the
+    receiver reconstructed it, so quantization error does not accumulate;
+    with a threshold, channels that moved less than it are left out via a
+    bit mask. A lost packet makes the receiver wait for the next keyframe.
+    """
+
+    def __init__(self, encoding='float16', delta=False, keyframe_interval=30, threshold=0.0, avatar=0):
+        """
+        Args:
+            encoding: Keyframe encoding, 'float32', 'float16' or 'int16'
+            delta: Send int8 differences between keyframes
+            keyframe_interval: Packets between keyframes with delta=True
+            threshold: Delta channels that moved less than this are not sent
+            avatar: Avatar id (0-255) carried in every packet
+        """
+        if encoding not in ENCODINGS:
+            raise ValueError(f"Unknown encoding: {encoding}")
+        self.encoding = encoding
+        self.delta = delta
+        self.keyframe_interval = keyframe_interval if delta else 1
+        self.threshold = threshold
+        self.avatar = avatar
+        self.sequence = 0
+        self._code = _ENCODING_NAMES.index(encoding)
+        self._params = np.zeros(NUM_PARAMS)
+        self._sent = np.zeros(NUM_PARAMS)      # as the receiver decodes it
+        self._values = np.zeros(NUM_PARAMS)
+        self._scratch = np.zeros(NUM_PARAMS)
+        self._keyframe_values = np.zeros(NUM_PARAMS, dtype=ENCODINGS[encoding])
+        self._delta_values = np.zeros(NUM_PARAMS, dtype=DELTA_DTYPE)
+        self._buffer = bytearray(MAX_PACKET)
+
+        self._views = {}
+        offset = 0
+        for name, size in CHANNELS:
+            self._views[name] = self._params[offset:offset + size]
+            offset += size
+
+    def encode(self, timestamp, expression, jaw_pose=None, eye_pose=None, head_pose=None, valid=True):
+        """
+        Encode one frame (missing poses are sent as zeros).
+
+        Returns a memoryview of an internal buffer, valid until the next call.
+        """
+        for name, value in (('expression', expression), ('jaw_pose', jaw_pose),
+                            ('eye_pose', eye_pose), ('head_pose', head_pose)):
+            if value is None:
+                self._views[name].fill(0.0)
+            else:
+                self._views[name][:] = value
+
+        reference = self.sequence
+        self.sequence = (self.sequence + 1) & 0xFFFFFFFF
+        keyframe = reference == 0 or self.sequence % self.keyframe_interval == 0
+        flags = FLAG_VALID if valid else 0
+        offset = HEADER.size
+
+        if keyframe:
+            flags |= FLAG_KEYFRAME
+            quantized = self._keyframe_values
+            scale = _quantize(self._params, quantized.dtype, quantized, self._scratch)
+            _dequantize(quantized, scale, self._sent)
+        else:
+            np.subtract(self._params, self._sent, out=self._values)
+            if self.threshold > 0:
+                flags |= FLAG_MASK
+                present = np.abs(self._values) >= self.threshold
+                self._buffer[offset:offset + MASK_BYTES] = np.packbits(present, bitorder='little').tobytes()
+                offset += MASK_BYTES
+                count = int(present.sum())
+                values = self._values[present]
+            else:
+                present = slice(None)
+                count = NUM_PARAMS
+                values = self._values
+            quantized = self._delta_values[:count]
+            scale = _quantize(values, DELTA_DTYPE, quantized, self._scratch[:count])
+            _dequantize(quantized, scale, self._values[:count])
+            self._sent[present] += self._values[:count]
+
+        end = offset + quantized.nbytes
+        self._buffer[offset:end] = quantized.data.cast('B')
+        HEADER.pack_into(self._buffer, 0, MAGIC, VERSION, self._code, flags, self.avatar,
+                         self.sequence, reference, int(timestamp) & 0xFFFFFFFF, scale)
+        return memoryview(self._buffer)[:end]
+
+
+class DecodedFrame:
+    """Latest parameters of one avatar, updated in place by ParameterDecoder."""
+
+    def __init__(self, avatar):
+        self.avatar = avatar
+        self.sequence = None
+        self.timestamp = 0
+        self.valid = False
+        self.synced = False     # params match the sender's (no delta missed)
+        self.params = np.zeros(NUM_PARAMS)
+        offset = 0
+        for name, size in CHANNELS:
+            setattr(self, name, self.params[offset:offset + size])
+            offset += size
+
+
+class ParameterDecoder:
+    """
+    Decodes packets from ParameterEncoder, keeping one DecodedFrame per avatar.
+
+    Packets older than the last one seen (reordered by the network) are
+    discarded. After a gap in the sequence, counted in `lost`, delta packets
+    are discarded as undecodable until the next keyframe resynchronizes.
+    """
+
+    def __init__(self):
+        self.frames = {}
+        self.received = 0
+        self.lost = 0
+        self.stale = 0
+        self.undecodable = 0
+        self._values = np.zeros(NUM_PARAMS)
+        self._mask = np.zeros(NUM_PARAMS, dtype=bool)
+
+    def decode(self, packet):
+        """
+        Apply one packet. Returns the avatar's DecodedFrame when its
+        parameters were updated, None when the packet was discarded.
+        """
+        if len(packet) < HEADER.size:
+            self.undecodable += 1
+            return None
+        magic, version, code, flags, avatar, sequence, reference, timestamp, scale = \
+            HEADER.unpack_from(packet, 0)
+        if magic != MAGIC or version != VERSION or code >= len(_ENCODING_NAMES):
+            self.undecodable += 1
+            return None
+        self.received += 1
+
+        frame = self.frames.get(avatar)
+        if frame is None:
+            frame = self.frames[avatar] = DecodedFrame(avatar)
+        if frame.sequence is not None:
+            ahead = (sequence - frame.sequence) & 0xFFFFFFFF
+            if ahead == 0 or ahead >= 1 << 31:
+                self.stale += 1
+                return None
+            self.lost += ahead - 1
+
+        keyframe = bool(flags & FLAG_KEYFRAME)
+        if not keyframe and not (frame.synced and reference == frame.sequence):
+            frame.sequence = sequence
+            frame.synced = False
+            self.undecodable += 1
+            return None
+
+        offset = HEADER.size
+        dtype = ENCODINGS[_ENCODING_NAMES[code]] if keyframe else DELTA_DTYPE
+        count = NUM_PARAMS
+        present = slice(None)
+        if flags & FLAG_MASK:
+            mask = np.frombuffer(packet, dtype=np.uint8, count=MASK_BYTES, offset=offset)
+            self._mask[:] = np.unpackbits(mask, count=NUM_PARAMS, bitorder='little')
+            count = int(self._mask.sum())
+            present = self._mask
+            offset += MASK_BYTES
+        if len(packet) < offset + count * dtype.itemsize:
+            self.undecodable += 1
+            return None
+        values = np.frombuffer(packet, dtype=dtype, count=count, offset=offset)
+
+        if keyframe:
+            _dequantize(values, scale, frame.params)
+        else:
+            # Same arithmetic as the encoder's reconstruction
+            _dequantize(values, scale, self._values[:count])
+            frame.params[present] += self._values[:count]
+        frame.sequence = sequence
+        frame.synced = True
+        frame.timestamp = timestamp
+        frame.valid = bool(flags & FLAG_VALID)
+        return frame
+
+    def stats(self):
+        return {'received': self.received, 'lost': self.lost, 'stale': self.stale,
+                'undecodable': self.undecodable}
+
+
+class ParameterSender:
+    """Streams encoded parameters of one or more avatars over UDP."""
+
+    def __init__(self, address, num_avatars=1, **encoder_options):
+        """
+        Args:
+            address: (host, port) of the receiver
+            num_avatars: Avatars sent, with ids 0..num_avatars-1
+            encoder_options: ParameterEncoder options (encoding, delta, ...)
+        """
+        self.address = address
+        self.encoders = [ParameterEncoder(avatar=avatar, **encoder_options) for avatar in range(num_avatars)]
+        self.packets_sent = 0
+        self.bytes_sent = 0
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def send(self, timestamp, expression, jaw_pose=None, eye_pose=None, head_pose=None, valid=True, avatar=0):
+        packet = self.encoders[avatar].encode(timestamp, expression, jaw_pose, eye_pose, head_pose, valid)
+        try:
+            self._socket.sendto(packet, self.address)
+        except OSError:
+            # Nobody listening (e.g. ICMP port unreachable): UDP is best effort
+            return
+        self.packets_sent += 1
+        self.bytes_sent += len(packet)
+
+    def close(self):
+        self._socket.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class ParameterReceiver:
+    """Receives and decodes parameter packets on a UDP port."""
+
+    def __init__(self, address=('0.0.0.0', DEFAULT_PORT)):
+        self.decoder = ParameterDecoder()
+        self.bytes_received = 0
+        self._buffer = bytearray(MAX_PACKET)
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._socket.bind(address)
+
+    @property
+    def address(self):
+        return self._socket.getsockname()
+
+    def receive(self, timeout=None):
+        """
+        Wait up to `timeout` seconds (None = forever) for the next packet.
+
+        Returns the updated DecodedFrame, or None on timeout or when the
+        packet was discarded.
+        """
+        self._socket.settimeout(timeout)
+        try:
+            size = self._socket.recv_into(self._buffer)
+        except socket.timeout:
+            return None
+        self.bytes_received += size
+        return self.decoder.decode(memoryview(self._buffer)[:size])
+
+    def close(self):
+        self._socket.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
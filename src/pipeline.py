@@ -0,0 +1,285 @@
+import collections
+import threading
+import time
+
+
+class FrameQueue:
+    """
+    Bounded queue between pipeline stages.
+
+    policy='block' is lossless: put() waits for space (use for files).
+    policy='drop_oldest' never blocks the producer: when full, the oldest
+    queued item is discarded and counted in `dropped` (use for live webcams).
+    A discarded item is passed to `on_drop`, e.g. to release its buffers.
+
+    Items must not be None; get() returns None once the queue is closed and empty.
+    """
+
+    def __init__(self, maxsize=2, policy='block', on_drop=None):
+        if policy not in ('block', 'drop_oldest'):
+            raise ValueError(f"Unknown queue policy: {policy}")
+        self.maxsize = maxsize
+        self.policy = policy
+        self.on_drop = on_drop
+        self.dropped = 0
+        self._items = collections.deque()
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def put(self, item):
+        with self._cond:
+            if self.policy == 'block':
+                while len(self._items) >= self.maxsize and not self._closed:
+                    self._cond.wait()
+            elif len(self._items) >= self.maxsize:
+                dropped = self._items.popleft()
+                self.dropped += 1
+                if self.on_drop is not None:
+                    self.on_drop(dropped)
+            if self._closed:
+                return
+            self._items.append(item)
+            self._cond.notify_all()
+
+    def get(self):
+        with self._cond:
+            while not self._items and not self._closed:
+                self._cond.wait()
+            if not self._items:
+                return None
+            item = self._items.popleft()
+            self._cond.notify_all()
+            return item
+
+    def close(self):
+        """Wake up all waiters; remaining items can still be drained with get()."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def __len__(self):
+        return len(self._items)
+
+    def __iter__(self):
+        while True:
+            item = self.get()
+            if item is None:
+                return
+            yield item
+
+
+class BufferPool:
+    """
+    Reusable buffers for items in flight through a Pipeline.
+
+    A stage takes a buffer with acquire(), and whoever finishes with the
+    item hands it back with release(): the consumer of the final queue, or
+    the on_drop callback of a drop_oldest queue. Unlike buffers used in
+    turn, a buffer is never overwritten while a slow consumer still reads
+    it, however many items are dropped meanwhile. The pool needs one buffer
+    per item that can be in flight at once: one per stage and consumer plus
+    queue_size per queue.
+
+    acquire() and release() are single deque operations, which are atomic
+    in CPython, so stages on different threads share a pool without a lock.
+    """
+
+    def __init__(self, buffers):
+        self._free = collections.deque(buffers)
+
+    def acquire(self):
+        try:
+            return self._free.popleft()
+        except IndexError:
+            raise RuntimeError("BufferPool is empty: a buffer in flight was never released") from None
+
+    def release(self, buffer):
+        self._free.append(buffer)
+
+    def __len__(self):
+        return len(self._free)
+
+
+class LatestSlot:
+    """
+    Holds only the newest item handed from one producer thread to one consumer.
+
+    put() publishes an item with a single reference assignment, which is
+    atomic in CPython, so neither side takes a lock or waits. take() returns
+    each item at most once. Items replaced before they were taken are counted
+    in `overwritten` (approximately: a put() racing a take() may count one
+    item that was in fact taken).
+    """
+
+    def __init__(self):
+        self.overwritten = 0
+        self._entry = None      # (sequence, item), replaced as a whole
+        self._put_count = 0     # written by the producer only
+        self._taken = 0         # written by the consumer only
+
+    def put(self, item):
+        if self._put_count > self._taken:
+            self.overwritten += 1
+        self._put_count += 1
+        self._entry = (self._put_count, item)
+
+    def take(self):
+        """The newest item if it has not been taken yet, otherwise None."""
+        entry = self._entry
+        if entry is None or entry[0] == self._taken:
+            return None
+        self._taken = entry[0]
+        return entry[1]
+
+
+class StageStats:
+    """Running timings for one pipeline stage."""
+
+    def __init__(self, name, window=120):
+        self.name = name
+        self.count = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self._recent = collections.deque(maxlen=window)
+
+    def record(self, seconds):
+        self.count += 1
+        self.total_time += seconds
+        self.max_time = max(self.max_time, seconds)
+        self._recent.append(seconds)
+
+    @property
+    def mean_ms(self):
+        return 1000 * self.total_time / self.count if self.count else 0.0
+
+    @property
+    def recent_ms(self):
+        return 1000 * sum(self._recent) / len(self._recent) if self._recent else 0.0
+
+    def as_dict(self):
+        return {
+            'frames': self.count,
+            'mean_ms': self.mean_ms,
+            'recent_ms': self.recent_ms,
+            'max_ms': 1000 * self.max_time,
+            'max_fps': 1000 / self.recent_ms if self.recent_ms else 0.0,
+        }
+
+
+class Stage(threading.Thread):
+    """
+    Worker thread that applies `fn` to every item of `in_queue`.
+
+    With in_queue=None the stage is a source and calls fn() until it returns
+    None. Results that are None are not forwarded (e.g. filtered frames).
+    The output queue is closed when the stage finishes so downstream stages
+    drain and stop in order.
+    """
+
+    def __init__(self, name, fn, in_queue, out_queue, stop_event):
+        super().__init__(name=name, daemon=True)
+        self.fn = fn
+        self.in_queue = in_queue
+        self.out_queue = out_queue
+        self.stop_event = stop_event
+        self.stats = StageStats(name)
+        self.error = None
+
+    def _items(self):
+        if self.in_queue is None:
+            while True:
+                yield None
+        else:
+            yield from self.in_queue
+
+    def run(self):
+        try:
+            for item in self._items():
+                if self.stop_event.is_set():
+                    break
+                start = time.perf_counter()
+                result = self.fn() if self.in_queue is None else self.fn(item)
+                self.stats.record(time.perf_counter() - start)
+                if result is None:
+                    if self.in_queue is None:
+                        break
+                    continue
+                self.out_queue.put(result)
+        except Exception as e:
+            self.error = e
+            self.stop_event.set()
+        finally:
+            self.out_queue.close()
+
+
+class Pipeline:
+    """
+    Chain of threaded stages connected by bounded FrameQueues.
+
+    Each stage runs concurrently, so throughput approaches the slowest stage
+    rather than the sum of all stages. The final queue is consumed by the
+    caller, typically on the main thread where GUI calls must happen.
+    """
+
+    def __init__(self, queue_size=2, policy='block'):
+        self.queue_size = queue_size
+        self.policy = policy
+        self.stop_event = threading.Event()
+        self.stages = []
+        self.queues = []
+        self.sink_stats = {}
+
+    def add_stage(self, name, fn, policy=None, on_drop=None):
+        """
+        Append a stage; the first one added is the source. `on_drop` is
+        called with every output item its queue discards.
+        """
+        in_queue = self.queues[-1] if self.queues else None
+        out_queue = FrameQueue(self.queue_size, policy or self.policy, on_drop=on_drop)
+        self.stages.append(Stage(name, fn, in_queue, out_queue, self.stop_event))
+        self.queues.append(out_queue)
+        return out_queue
+
+    @property
+    def output(self):
+        return self.queues[-1]
+
+    def start(self):
+        for stage in self.stages:
+            stage.start()
+
+    def stop(self):
+        self.stop_event.set()
+        for queue in self.queues:
+            queue.close()
+
+    def join(self):
+        for stage in self.stages:
+            stage.join()
+        for stage in self.stages:
+            if stage.error is not None:
+                raise RuntimeError(f"Pipeline stage '{stage.name}' failed") from stage.error
+
+    def record(self, name, seconds):
+        """Record timing for work done by the consumer of the final queue."""
+        if name not in self.sink_stats:
+            self.sink_stats[name] = StageStats(name)
+        self.sink_stats[name].record(seconds)
+
+    def stats(self):
+        """Per-stage timings and per-queue drop counts."""
+        stages = {stage.name: stage.stats.as_dict() for stage in self.stages}
+        stages.update({name: stats.as_dict() for name, stats in self.sink_stats.items()})
+        for stage, queue in zip(self.stages, self.queues):
+            stages[stage.name]['dropped_after'] = queue.dropped
+        return stages
+
+    def report(self):
+        lines = []
+        stats = self.stats()
+        bottleneck = max(stats, key=lambda name: stats[name]['recent_ms'])
+        for name, s in stats.items():
+            marker = '  <- bottleneck' if name == bottleneck else ''
+            lines.append(f"  {name:10s} {s['recent_ms']:7.2f} ms (max {s['max_ms']:6.1f} ms, "
+                         f"≤{s['max_fps']:5.1f} FPS) dropped={s.get('dropped_after', 0)}{marker}")
+        return "\n".join(lines)
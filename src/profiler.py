@@ -0,0 +1,224 @@
+import contextlib
+import csv
+import json
+import tempfile
+import time
+
+import numpy as np
+
+
+class RollingHistogram:
+    """Fixed-size ring buffer of recent samples with percentile queries."""
+
+    def __init__(self, window=300):
+        self._samples = np.zeros(window)
+        self.count = 0
+
+    def add(self, value):
+        self._samples[self.count % len(self._samples)] = value
+        self.count += 1
+
+    def values(self):
+        return self._samples[:min(self.count, len(self._samples))]
+
+    def percentiles(self, qs=(50, 95, 99)):
+        values = self.values()
+        if len(values) == 0:
+            return [0.0] * len(qs)
+        return list(np.percentile(values, qs))
+
+
+class _Span:
+    """Reusable timing context for one named stage (not re-entrant)."""
+
+    __slots__ = ('profiler', 'name', 'start')
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.profiler.record(self.name, time.perf_counter() - self.start)
+
+
+class CsvSink:
+    """
+    One CSV row per frame, with a column for every span seen in any frame.
+
+    Spans can first appear late (e.g. 'deform' once a face shows up), so
+    rows are spooled to a temporary file and the CSV is written on close(),
+    when the full set of columns is known. Spans a frame did not run are
+    left empty.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._columns = {}
+        self._spool = tempfile.TemporaryFile('w+')
+
+    def write(self, row):
+        for name in row:
+            self._columns.setdefault(name, None)
+        self._spool.write(json.dumps(row) + '\n')
+
+    def close(self):
+        if self._spool is None:
+            return
+        self._spool.seek(0)
+        with open(self.path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=list(self._columns))
+            writer.writeheader()
+            for line in self._spool:
+                writer.writerow(json.loads(line))
+        self._spool.close()
+        self._spool = None
+
+
+class JsonlSink:
+    """One JSON object per frame."""
+
+    def __init__(self, path):
+        self._file = open(path, 'w')
+
+    def write(self, row):
+        self._file.write(json.dumps(row) + '\n')
+
+    def close(self):
+        self._file.close()
+
+
+def open_sink(path):
+    """Pick a sink from the file extension (.csv, otherwise JSON lines)."""
+    return CsvSink(path) if path.lower().endswith('.csv') else JsonlSink(path)
+
+
+class Profiler:
+    """
+    Named per-stage spans with rolling p50/p95/p99 latencies and achieved FPS.
+
+    Usage per frame:
+        with profiler.span('detect'):
+            ...
+        profiler.end_frame()
+    """
+
+    enabled = True
+
+    def __init__(self, source_fps=None, window=300, sink=None):
+        """
+        Args:
+            source_fps: Frame rate of the input, reported next to the achieved FPS
+            window: Number of recent frames kept for percentiles
+            sink: Optional CsvSink/JsonlSink receiving one row per frame
+        """
+        self.source_fps = source_fps
+        self.window = window
+        self.sink = sink
+        self.histograms = {}
+        self.frame_count = 0
+        self._spans = {}
+        self._current = {}
+        self._frame_times = RollingHistogram(window)
+        self._last_frame_end = None
+        self._start_time = time.perf_counter()
+
+    def span(self, name):
+        span = self._spans.get(name)
+        if span is None:
+            span = self._spans[name] = _Span(self, name)
+        return span
+
+    def record(self, name, seconds):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = RollingHistogram(self.window)
+        histogram.add(seconds * 1000)
+        self._current[name] = self._current.get(name, 0.0) + seconds * 1000
+
+    def end_frame(self):
+        """Close the current frame: update FPS and emit a row to the sink."""
+        now = time.perf_counter()
+        if self._last_frame_end is not None:
+            self._frame_times.add(now - self._last_frame_end)
+        self._last_frame_end = now
+        self.frame_count += 1
+
+        if self.sink is not None:
+            row = {'frame': self.frame_count, 'time_s': round(now - self._start_time, 6),
+                   'fps': round(self.fps, 2)}
+            row.update({name: round(ms, 4) for name, ms in self._current.items()})
+            self.sink.write(row)
+        self._current.clear()
+
+    @property
+    def fps(self):
+        """Achieved frames per second over the rolling window."""
+        frame_times = self._frame_times.values()
+        return len(frame_times) / frame_times.sum() if len(frame_times) and frame_times.sum() > 0 else 0.0
+
+    def summary(self):
+        stats = {}
+        for name, histogram in self.histograms.items():
+            p50, p95, p99 = histogram.percentiles()
+            stats[name] = {'p50_ms': p50, 'p95_ms': p95, 'p99_ms': p99}
+        return {'fps': self.fps, 'source_fps': self.source_fps, 'spans': stats}
+
+    def report(self):
+        source = f" / source {self.source_fps:.1f}" if self.source_fps else ""
+        lines = [f"  achieved {self.fps:.1f} FPS{source}"]
+        for name, s in self.summary()['spans'].items():
+            lines.append(f"  {name:10s} p50 {s['p50_ms']:7.2f}  p95 {s['p95_ms']:7.2f}  p99 {s['p99_ms']:7.2f} ms")
+        return "\n".join(lines)
+
+    def draw_overlay(self, image, origin=(10, 20), line_height=18):
+        """Draw FPS and per-span p50/p95 latencies onto a BGR image in place."""
+        import cv2
+
+        source = f" / {self.source_fps:.1f}" if self.source_fps else ""
+        lines = [f"FPS {self.fps:.1f}{source}"]
+        for name, s in self.summary()['spans'].items():
+            lines.append(f"{name} {s['p50_ms']:.1f} / {s['p95_ms']:.1f} ms")
+        x, y = origin
+        for i, line in enumerate(lines):
+            cv2.putText(image, line, (x, y + i * line_height), cv2.FONT_HERSHEY_SIMPLEX,
+                        0.5, (0, 255, 0), 1, cv2.LINE_AA)
+        return image
+
+    def close(self):
+        if self.sink is not None:
+            self.sink.close()
+
+
+class NullProfiler:
+    """Drop-in Profiler replacement that records nothing."""
+
+    enabled = False
+    fps = 0.0
+    frame_count = 0
+    _span = contextlib.nullcontext()
+
+    def span(self, name):
+        return self._span
+
+    def record(self, name, seconds):
+        pass
+
+    def end_frame(self):
+        pass
+
+    def summary(self):
+        return {}
+
+    def report(self):
+        return ""
+
+    def draw_overlay(self, image, origin=(10, 20), line_height=18):
+        return image
+
+    def close(self):
+        pass
@@ -0,0 +1,217 @@
+import json
+import os
+
+import numpy as np
+
+from npy_writer import NpyAppendWriter
+
+# MediaPipe FaceLandmarker mesh, including the 10 iris points
+NUM_LANDMARKS = 478
+
+# One record per source frame. Aligned so every field of a memory-mapped
+# record starts on its natural boundary.
+RECORD_DTYPE = np.dtype([
+    ('timestamp', np.int64),                    # milliseconds, non-decreasing
+    ('valid', np.bool_),                        # face detected in this frame
+    ('scores', np.float32, (52,)),              # blendshapes in MediaPipe order
+    ('landmarks', np.float32, (NUM_LANDMARKS, 3)),  # normalized x, y, z
+    ('expression', np.float32, (100,)),
+    ('jaw_pose', np.float32, (3,)),
+    ('eye_pose', np.float32, (6,)),
+    ('head_pose', np.float32, (3,)),            # yaw, pitch, roll in radians
+], align=True)
+
+# The structured dtype description does not fit the default .npy header
+RECORD_HEADER_SIZE = 512
+
+
+def metadata_path(path):
+    """JSON file kept next to a recording: session.rec.npy -> session.rec.json."""
+    root, _ = os.path.splitext(path)
+    return root + '.json'
+
+
+def landmarks_to_array(landmarks, out):
+    """Copy MediaPipe NormalizedLandmarks into an (N, 3) array."""
+    for i, point in enumerate(landmarks):
+        out[i, 0] = point.x
+        out[i, 1] = point.y
+        out[i, 2] = point.z
+    return out
+
+
+class RecordingWriter:
+    """
+    Streams tracking results to a recording file, one record per frame.
+
+    A recording is a standard .npy file of RECORD_DTYPE records appended
+    through NpyAppendWriter, so it stays readable while it grows and after
+    a crash, and can be continued later with append=True. Properties of
+    the source that the records do not hold go to a small JSON file next
+    to it (see metadata_path()).
+    """
+
+    def __init__(self, path, append=False, flush_every=64, aspect_ratio=None):
+        """
+        Args:
+            path: Output file, conventionally *.rec.npy
+            append: Continue an existing recording instead of replacing it.
+                A session whose clock starts over (e.g. at 0) is shifted to
+                continue right after the last recorded frame.
+            flush_every: Frames between header updates on disk
+            aspect_ratio: Source frame width / height. Landmarks are stored
+                normalized, so re-solving head poses needs it.
+        """
+        self.path = path
+        if aspect_ratio is not None:
+            _write_metadata(path, {'aspect_ratio': float(aspect_ratio)})
+        self._writer = NpyAppendWriter(path, (), RECORD_DTYPE, flush_every,
+                                       append=append, header_size=RECORD_HEADER_SIZE)
+        self._record = np.zeros(1, dtype=RECORD_DTYPE)
+        self._last_timestamp = None
+        self._timestamp_offset = None
+        if self._writer.num_rows:
+            recording = np.load(path, mmap_mode='r')
+            self._last_timestamp = int(recording['timestamp'][self._writer.num_rows - 1])
+        else:
+            self._timestamp_offset = 0
+
+    @property
+    def num_frames(self):
+        return self._writer.num_rows
+
+    def write(self, timestamp, valid, scores=None, landmarks=None, expression=None,
+              jaw_pose=None, eye_pose=None, head_pose=None):
+        """
+        Append one frame. Missing fields (None), e.g. for frames without a
+        face or with the manual mapping, are stored as zeros. `landmarks`
+        is an (478, 3) array or a list of MediaPipe landmarks.
+        """
+        if self._timestamp_offset is None:
+            # First frame appended to an existing recording
+            self._timestamp_offset = max(0, self._last_timestamp + 1 - timestamp)
+        timestamp += self._timestamp_offset
+        if self._last_timestamp is not None and timestamp < self._last_timestamp:
+            raise ValueError(f"Timestamps must not decrease: {timestamp} after {self._last_timestamp}")
+        self._last_timestamp = timestamp
+
+        record = self._record[0]
+        record['timestamp'] = timestamp
+        record['valid'] = valid
+        for name, value in (('scores', scores), ('expression', expression), ('jaw_pose', jaw_pose),
+                            ('eye_pose', eye_pose), ('head_pose', head_pose)):
+            if value is None:
+                record[name] = 0.0
+            else:
+                record[name] = value
+        if landmarks is None:
+            record['landmarks'] = 0.0
+        elif isinstance(landmarks, np.ndarray):
+            record['landmarks'] = landmarks
+        else:
+            landmarks_to_array(landmarks, record['landmarks'])
+        self._writer.extend(self._record)
+
+    def flush(self):
+        self._writer.flush()
+
+    def close(self):
+        self._writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class Recording:
+    """
+    Memory-mapped view of a recording written by RecordingWriter.
+
+    Fields are exposed as (N, ...) arrays read straight from the file
+    (timestamps, valid, scores, landmarks, expression, jaw_pose, eye_pose,
+    head_pose). seek() finds the frame shown at a given time in O(1):
+    timestamps are split into buckets one frame interval wide, and a table
+    built when the recording is opened holds the frame on screen at the
+    start of every bucket.
+
+    aspect_ratio is the source frame width / height, or None for
+    recordings made before it was stored.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.frames = np.load(path, mmap_mode='r')
+        if self.frames.dtype != RECORD_DTYPE:
+            raise ValueError(f"{path} is not a FLAME recording")
+        self.aspect_ratio = _read_metadata(path).get('aspect_ratio')
+        self.timestamps = self.frames['timestamp']
+        self.valid = self.frames['valid']
+        self.scores = self.frames['scores']
+        self.landmarks = self.frames['landmarks']
+        self.expression = self.frames['expression']
+        self.jaw_pose = self.frames['jaw_pose']
+        self.eye_pose = self.frames['eye_pose']
+        self.head_pose = self.frames['head_pose']
+        self._build_index()
+
+    def _build_index(self):
+        timestamps = np.asarray(self.timestamps)
+        if len(timestamps) == 0:
+            self._bucket_ms = 1
+            self._bucket_frames = np.zeros(1, dtype=np.intp)
+            return
+        intervals = np.diff(timestamps)
+        intervals = intervals[intervals > 0]
+        # Median frame interval: about one frame per bucket
+        self._bucket_ms = max(1, int(np.median(intervals))) if len(intervals) else 1
+        num_buckets = (timestamps[-1] - timestamps[0]) // self._bucket_ms + 1
+        bucket_starts = timestamps[0] + np.arange(num_buckets) * self._bucket_ms
+        # Last frame at or before the start of every bucket
+        self._bucket_frames = np.searchsorted(timestamps, bucket_starts, side='right') - 1
+
+    def __len__(self):
+        return len(self.frames)
+
+    def __getitem__(self, index):
+        return self.frames[index]
+
+    @property
+    def duration(self):
+        """Seconds between the first and the last frame."""
+        return (self.timestamps[-1] - self.timestamps[0]) / 1000 if len(self) else 0.0
+
+    def seek(self, timestamp):
+        """
+        Index of the frame on screen at `timestamp` (ms): the last frame at
+        or before it, clamped to the first and last frame.
+        """
+        timestamps = self.timestamps
+        if len(timestamps) == 0:
+            raise IndexError("Empty recording")
+        bucket = (timestamp - timestamps[0]) // self._bucket_ms
+        if bucket < 0:
+            return 0
+        if bucket >= len(self._bucket_frames):
+            return len(timestamps) - 1
+        index = int(self._bucket_frames[bucket])
+        # Frames within the bucket; about one for a steady frame rate
+        while index + 1 < len(timestamps) and timestamps[index + 1] <= timestamp:
+            index += 1
+        return index
+
+
+def _write_metadata(path, metadata):
+    tmp_path = metadata_path(path) + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(metadata, f, indent=2)
+    os.replace(tmp_path, metadata_path(path))
+
+
+def _read_metadata(path):
+    try:
+        with open(metadata_path(path)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
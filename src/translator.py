@@ -35,24 +35,133 @@
 #         return v_shaped
 
 import numpy as np
-import pickle
 import os
 
+from flame_cache import load_flame_model
+
+# MediaPipe blendshape order
+BLENDSHAPE_NAMES = [
+    '_neutral', 'browDownLeft', 'browDownRight', 'browInnerUp', 
+    'browOuterUpLeft', 'browOuterUpRight', 'cheekPuff', 'cheekSquintLeft',
+    'cheekSquintRight', 'eyeBlinkLeft', 'eyeBlinkRight', 'eyeLookDownLeft',
+    'eyeLookDownRight', 'eyeLookInLeft', 'eyeLookInRight', 'eyeLookOutLeft',
+    'eyeLookOutRight', 'eyeLookUpLeft', 'eyeLookUpRight', 'eyeSquintLeft',
+    'eyeSquintRight', 'eyeWideLeft', 'eyeWideRight', 'jawForward',
+    'jawLeft', 'jawOpen', 'jawRight', 'mouthClose', 'mouthDimpleLeft',
+    'mouthDimpleRight', 'mouthFrownLeft', 'mouthFrownRight', 'mouthFunnel',
+    'mouthLeft', 'mouthLowerDownLeft', 'mouthLowerDownRight', 'mouthPressLeft',
+    'mouthPressRight', 'mouthPucker', 'mouthRight', 'mouthRollLower',
+    'mouthRollUpper', 'mouthShrugLower', 'mouthShrugUpper', 'mouthSmileLeft',
+    'mouthSmileRight', 'mouthStretchLeft', 'mouthStretchRight', 'mouthUpperUpLeft',
+    'mouthUpperUpRight', 'noseSneerLeft', 'noseSneerRight'
+]
+
+# Global multiplier applied to pre-trained expressions for better visibility
+EXPRESSION_AMPLIFICATION = 2.0
+
+# Fallback manual mapping: (blendshape, FLAME expression index, multiplier)
+MANUAL_EXPRESSION_MAP = [
+    ('jawOpen', 0, 8.0),
+    ('mouthSmileLeft', 1, 6.0),
+    ('mouthSmileRight', 2, 6.0),
+    ('browInnerUp', 3, 5.0),
+    ('eyeBlinkLeft', 4, 8.0),
+    ('eyeBlinkRight', 5, 8.0),
+    ('mouthFunnel', 6, 6.0),
+    ('mouthPucker', 7, 6.0),
+]
+
+# FLAME joint order: global, neck, jaw, left eye, right eye. Head rotation is
+# applied separately by transform_mesh, so only these joints are articulated.
+JAW_JOINT = 2
+EYE_JOINTS = (3, 4)
+ARTICULATED_JOINTS = (JAW_JOINT,) + EYE_JOINTS
+
+# deform_batch kernel per dtype (OpenBLAS): float64 runs expr @ basis.T
+# against a contiguous copy of the transposed basis at every chunk size;
+# float32 chunks up to SMALL_BATCH frames run basis @ expr.T, which streams
+# the basis once, and larger chunks expr @ basis.T. The float32 product is
+# much faster for a multiple of SGEMM_WIDTH columns (three take longer than
+# four), so small chunks are padded to one; every output column depends
+# only on its own expression row, so the padding rows are never cleared
+SMALL_BATCH = 16
+SGEMM_WIDTH = 4
+
+
+def batch_rodrigues(rotvecs, out):
+    """Axis-angle vectors (N, 3) -> rotation matrices written into out (N, 3, 3)."""
+    theta = np.linalg.norm(rotvecs, axis=1)
+    axis = rotvecs / np.maximum(theta, 1e-8)[:, None]
+    x, y, z = axis[:, 0], axis[:, 1], axis[:, 2]
+    sin, cos = np.sin(theta), np.cos(theta)
+    one_minus_cos = 1.0 - cos
+    out[:, 0, 0] = cos + x * x * one_minus_cos
+    out[:, 0, 1] = x * y * one_minus_cos - z * sin
+    out[:, 0, 2] = x * z * one_minus_cos + y * sin
+    out[:, 1, 0] = y * x * one_minus_cos + z * sin
+    out[:, 1, 1] = cos + y * y * one_minus_cos
+    out[:, 1, 2] = y * z * one_minus_cos - x * sin
+    out[:, 2, 0] = z * x * one_minus_cos - y * sin
+    out[:, 2, 1] = z * y * one_minus_cos + x * sin
+    out[:, 2, 2] = cos + z * z * one_minus_cos
+    return out
+
+
 class FlameTranslator:
-    def __init__(self, model_path, mappings_path='./mappings'):
+    def __init__(self, model_path, mappings_path='./mappings', dtype=np.float64):
         """
         Initialize with FLAME model and optional pre-trained mappings.
         
         Args:
-            model_path: Path to FLAME model
-            mappings_path: Path to folder with mapping .npy files (optional)
+            model_path: Path to FLAME model, or a dict of arrays as returned
+                by load_flame_model (e.g. a synthetic model for benchmarks)
+            mappings_path: Path to folder with mapping .npy files (optional,
+                None forces the fallback manual mapping)
+            dtype: Deformation precision. np.float32 halves memory bandwidth
+                and uses the memory-mapped cache arrays directly
         """
-        # Load FLAME model
-        with open(model_path, 'rb') as f:
-            self.model = pickle.load(f, encoding='latin1')
+        # Load FLAME model (memory-mapped from the precompiled cache)
+        if isinstance(model_path, dict):
+            self.model = model_path
+        else:
+            self.model = load_flame_model(model_path)
 
         self.v_template = self.model['v_template']
-        self.expression_basis = self.model['shapedirs'][:, :, 300:400]
+        self.expression_basis = self.model['expression_basis']
+        self.faces = self.model['f']
+
+        # Deformation engine state: contiguous basis in the working dtype plus
+        # reusable buffers so the per-frame path allocates nothing
+        self.dtype = np.dtype(dtype)
+        self._basis = np.ascontiguousarray(self.expression_basis, dtype=self.dtype)
+        self._v_template_flat = np.ascontiguousarray(self.v_template, dtype=self.dtype).reshape(-1)
+        num_vertices = self.v_template.shape[0]
+        self._expr_buf = np.zeros(self._basis.shape[1], dtype=self.dtype)
+        self._vertices = np.empty((num_vertices, 3), dtype=self.dtype)
+        self._posed = np.empty((num_vertices, 3), dtype=self.dtype)
+        self._rotation = np.empty((3, 3), dtype=self.dtype)
+        self._centroid = np.empty(3, dtype=self.dtype)
+        # Centroid as a BLAS mat-vec product: np.mean over axis 0 allocates
+        # a reduction buffer on every call
+        self._mean_weights = np.full(num_vertices, 1.0 / num_vertices, dtype=self.dtype)
+
+        # Padded expressions and (V*3, n) product buffer for small float32
+        # deform_batch chunks
+        self._batch_expr = np.zeros((SMALL_BATCH, self._basis.shape[1]), dtype=self.dtype)
+        self._batch_columns = np.empty(num_vertices * 3 * SMALL_BATCH, dtype=self.dtype)
+        # Contiguous (100, V*3) basis, built on first use by deform_batch
+        # (float64) or init_incremental
+        self._basis_rows = None
+
+        # Kept vertex state for deform_incremental, set up by init_incremental
+        self._shaped = None
+        # Precomposed blendshape basis for deform_low_rank, set up by init_low_rank
+        self._low_rank_basis = None
+
+        # Jaw/eye articulation (linear blend skinning), precomputed at load
+        self.has_articulation = 'weights' in self.model
+        if self.has_articulation:
+            self._init_articulation()
         
         # Try to load pre-trained mappings
         self.use_pretrained = False
@@ -65,7 +174,7 @@ class FlameTranslator:
             os.path.abspath(mappings_path),
             './mappings',
             os.path.join(os.getcwd(), 'mappings')
-        ]
+        ] if mappings_path is not None else []
         
         for path_attempt in possible_paths:
             try:
@@ -78,8 +187,10 @@ class FlameTranslator:
                     print(f"✓ Loaded expression mapping from: {os.path.abspath(path_attempt)}")
                     print(f"  - bs2exp shape: {self.bs2exp.shape}")
                     
-                    # Try to load pose mapping (optional)
+                    # Try to load pose mapping (optional), shipped as bs2jaw.npy
                     bs2pose_path = os.path.join(path_attempt, 'bs2pose.npy')
+                    if not os.path.exists(bs2pose_path):
+                        bs2pose_path = os.path.join(path_attempt, 'bs2jaw.npy')
                     if os.path.exists(bs2pose_path):
                         self.bs2pose = np.load(bs2pose_path)
                         self.has_pose_mapping = True
@@ -112,77 +223,513 @@ class FlameTranslator:
             print("  From: https://github.com/PeizhiYan/mediapipe-blendshapes-to-flame")
             
         if self.use_pretrained:
-            # MediaPipe blendshape order
-            self.blendshape_names = [
-                '_neutral', 'browDownLeft', 'browDownRight', 'browInnerUp', 
-                'browOuterUpLeft', 'browOuterUpRight', 'cheekPuff', 'cheekSquintLeft',
-                'cheekSquintRight', 'eyeBlinkLeft', 'eyeBlinkRight', 'eyeLookDownLeft',
-                'eyeLookDownRight', 'eyeLookInLeft', 'eyeLookInRight', 'eyeLookOutLeft',
-                'eyeLookOutRight', 'eyeLookUpLeft', 'eyeLookUpRight', 'eyeSquintLeft',
-                'eyeSquintRight', 'eyeWideLeft', 'eyeWideRight', 'jawForward',
-                'jawLeft', 'jawOpen', 'jawRight', 'mouthClose', 'mouthDimpleLeft',
-                'mouthDimpleRight', 'mouthFrownLeft', 'mouthFrownRight', 'mouthFunnel',
-                'mouthLeft', 'mouthLowerDownLeft', 'mouthLowerDownRight', 'mouthPressLeft',
-                'mouthPressRight', 'mouthPucker', 'mouthRight', 'mouthRollLower',
-                'mouthRollUpper', 'mouthShrugLower', 'mouthShrugUpper', 'mouthSmileLeft',
-                'mouthSmileRight', 'mouthStretchLeft', 'mouthStretchRight', 'mouthUpperUpLeft',
-                'mouthUpperUpRight', 'noseSneerLeft', 'noseSneerRight'
-            ]
+            self.blendshape_names = BLENDSHAPE_NAMES
         else:
             self.blendshape_names = None
 
-    def mediapipe_to_array(self, mediapipe_scores):
-        """Convert MediaPipe scores to ordered numpy array."""
-        score_dict = {b.category_name: b.score for b in mediapipe_scores}
-        blendshape_array = np.zeros(52)
-        for i, name in enumerate(self.blendshape_names):
-            if name in score_dict:
-                blendshape_array[i] = score_dict[name]
-        return blendshape_array
+        # Combined mapping [expression | jaw | eye], (52, 109) pre-trained or
+        # (52, 100) manual, so per-frame and batched translation are a single
+        # matrix product. The manual table has only 8 non-zeros, but a dense
+        # 52x100 product is cheaper than any sparse indexing at this size.
+        if self.use_pretrained:
+            self._mapping = np.hstack([
+                self.bs2exp * EXPRESSION_AMPLIFICATION, self.bs2pose, self.bs2eye
+            ]).astype(np.float64)
+        else:
+            self._mapping = np.zeros((len(BLENDSHAPE_NAMES), self._basis.shape[1]))
+            for name, expr_index, multiplier in MANUAL_EXPRESSION_MAP:
+                self._mapping[BLENDSHAPE_NAMES.index(name), expr_index] = multiplier
+
+        # Per-frame ingestion buffers. The extra trailing score slot absorbs
+        # categories that are not in BLENDSHAPE_NAMES.
+        num_blendshapes = len(BLENDSHAPE_NAMES)
+        self._scores_ext = np.zeros(num_blendshapes + 1)
+        self._scores = self._scores_ext[:num_blendshapes]
+        self._score_order = None
+        self._score_order_is_identity = False
+        self._params = np.zeros(self._mapping.shape[1])
+        if self.use_pretrained:
+            num_expr = self.bs2exp.shape[1]
+            num_jaw = self.bs2pose.shape[1]
+            self._translation = (self._params[:num_expr],
+                                 self._params[num_expr:num_expr + num_jaw],
+                                 self._params[num_expr + num_jaw:])
+        else:
+            self._translation = (self._params, None, None)
+
+    def _resolve_score_order(self, mediapipe_scores):
+        """Map the category order of a MediaPipe result onto BLENDSHAPE_NAMES once."""
+        name_to_index = {name: i for i, name in enumerate(BLENDSHAPE_NAMES)}
+        unknown = len(BLENDSHAPE_NAMES)
+        order = [name_to_index.get(b.category_name, unknown) for b in mediapipe_scores]
+        self._score_order = np.array(order, dtype=np.intp)
+        self._score_order_is_identity = order == list(range(len(BLENDSHAPE_NAMES)))
+        if not self._score_order_is_identity:
+            # Categories missing from this result must read as zero
+            self._scores_ext[:] = 0.0
+
+    def mediapipe_to_array(self, mediapipe_scores, out=None):
+        """
+        Convert MediaPipe scores to ordered numpy array.
+
+        The name -> index order is resolved from the first result (MediaPipe
+        keeps it stable), after which only the scores are read. The result is
+        written into `out` when given, otherwise into an internal buffer that
+        is overwritten by the next call.
+        """
+        if self._score_order is None or len(mediapipe_scores) != len(self._score_order):
+            self._resolve_score_order(mediapipe_scores)
+
+        if self._score_order_is_identity:
+            self._scores[:] = [b.score for b in mediapipe_scores]
+        else:
+            self._scores_ext[self._score_order] = [b.score for b in mediapipe_scores]
+
+        if out is None:
+            return self._scores
+        out[:] = self._scores
+        return out
 
     def translate(self, mediapipe_scores):
         """
         Convert MediaPipe scores to FLAME parameters.
         Returns (expression, jaw_pose, eye_pose) if using pre-trained,
-        or just expression if using manual mapping.
+        or (expression, None, None) if using manual mapping.
+
+        Both paths are one product with the combined mapping. The returned
+        arrays are views of an internal buffer overwritten by the next call.
         """
-        if self.use_pretrained:
-            # Use pre-trained linear mappings
-            blendshape_array = self.mediapipe_to_array(mediapipe_scores)
-            expression = blendshape_array @ self.bs2exp
-            jaw_pose = blendshape_array @ self.bs2pose
-            eye_pose = blendshape_array @ self.bs2eye
-            
-            # AMPLIFY EXPRESSIONS for better visibility
-            expression = expression * 2.0  # 2x amplification
-            
-            return expression, jaw_pose, eye_pose
-        else:
-            # Fallback: Manual mapping with AMPLIFIED multipliers
-            flame_expr = np.zeros(100)
-            for b in mediapipe_scores:
-                if b.category_name == 'jawOpen':
-                    flame_expr[0] = b.score * 8.0
-                if b.category_name == 'mouthSmileLeft':
-                    flame_expr[1] = b.score * 6.0
-                if b.category_name == 'mouthSmileRight':
-                    flame_expr[2] = b.score * 6.0
-                if b.category_name == 'browInnerUp':
-                    flame_expr[3] = b.score * 5.0
-                if b.category_name == 'eyeBlinkLeft':
-                    flame_expr[4] = b.score * 8.0
-                if b.category_name == 'eyeBlinkRight':
-                    flame_expr[5] = b.score * 8.0
-                if b.category_name == 'mouthFunnel':
-                    flame_expr[6] = b.score * 6.0
-                if b.category_name == 'mouthPucker':
-                    flame_expr[7] = b.score * 6.0
-            return flame_expr, None, None
+        return self.translate_scores(self.mediapipe_to_array(mediapipe_scores))
+
+    def translate_scores(self, scores):
+        """
+        translate() for a (52,) score array in MediaPipe order, e.g. read
+        back from a recording. Returns views of the same internal buffer.
+        """
+        np.dot(scores, self._mapping, out=self._params)
+        return self._translation
+
+    def translate_batch(self, scores):
+        """
+        Convert a whole clip of blendshape scores to FLAME parameters.
+
+        Args:
+            scores: (N, 52) array of blendshape scores in MediaPipe order
+
+        Returns:
+            (expression (N, 100), jaw_pose (N, 3), eye_pose (N, 6)) if using
+            pre-trained, or (expression, None, None) with manual mapping.
+            All returned arrays are views of one (N, 109) result.
+        """
+        params = np.asarray(scores, dtype=np.float64) @ self._mapping
+        if not self.use_pretrained:
+            return params, None, None
+        num_expr = self.bs2exp.shape[1]
+        num_jaw = self.bs2pose.shape[1]
+        return (params[:, :num_expr],
+                params[:, num_expr:num_expr + num_jaw],
+                params[:, num_expr + num_jaw:])
     
-    def deform_mesh(self, flame_expr, jaw_pose=None):
+    def _init_articulation(self):
+        """
+        Precompute everything linear blend skinning needs for the jaw and eyes.
+
+        Joint locations are regressed from the template and the expression
+        basis once, so per frame they are a (15, 100) product. Skinning is
+        restricted to the vertices with non-zero weight on an articulated
+        joint; every other vertex only follows the (unposed) neck and root.
+        """
+        num_vertices = self.v_template.shape[0]
+        num_expr = self._basis.shape[1]
+        J_regressor = np.asarray(self.model['J_regressor'], dtype=np.float64)
+        num_joints = J_regressor.shape[0]
+
+        self._joints_template = J_regressor @ np.asarray(self.v_template, dtype=np.float64)
+        basis = np.asarray(self.expression_basis, dtype=np.float64).reshape(num_vertices, 3, num_expr)
+        self._joints_basis = np.einsum('jv,vcn->jcn', J_regressor, basis).reshape(-1, num_expr)
+
+        parents = np.asarray(self.model['kintree_table'])[0].astype(np.int64)
+        parents[0] = -1
+        self._parents = parents
+
+        # Pose-corrective blendshapes are driven by (R - I) of every non-root
+        # joint; the neck is never posed here, so only its columns are dropped
+        first_column = (JAW_JOINT - 1) * 9
+        self._posedirs = np.ascontiguousarray(self.model['posedirs'][:, first_column:], dtype=self.dtype)
+        self._pose_feature = np.zeros(self._posedirs.shape[1], dtype=self.dtype)
+        self._pose_offsets = np.empty(num_vertices * 3, dtype=self.dtype)
+
+        weights = np.asarray(self.model['weights'])
+        articulated = list(ARTICULATED_JOINTS)
+        self._skin_index = np.nonzero(weights[:, articulated].sum(axis=1) > 0)[0]
+        # Flat x, y, z indices into the (V*3,) vertex buffer; take() with
+        # mode='clip' writes straight into out= without an internal copy
+        self._skin_flat_index = (self._skin_index[:, None] * 3 + np.arange(3)).ravel()
+        self._skin_weights = np.ascontiguousarray(weights[self._skin_index][:, articulated], dtype=self.dtype)
+        num_skinned = len(self._skin_index)
+
+        self._pose = np.zeros((num_joints, 3))
+        self._joint_rotations = np.empty((num_joints, 3, 3))
+        self._joints = np.empty((num_joints, 3))
+        self._joint_transforms = np.empty((num_joints, 3, 4))
+        self._identity = np.eye(3)
+        self._skin_joint_linear = np.empty((len(articulated), 9), dtype=self.dtype)
+        self._skin_joint_offset = np.empty((len(articulated), 3), dtype=self.dtype)
+        self._skin_linear = np.empty((num_skinned, 9), dtype=self.dtype)
+        self._skin_offset = np.empty((num_skinned, 3), dtype=self.dtype)
+        self._skin_vertices = np.empty((num_skinned, 3), dtype=self.dtype)
+        self._skinned = np.empty((num_skinned, 3), dtype=self.dtype)
+
+    def _articulate(self, vertices, expr, jaw_pose, eye_pose):
+        """Apply jaw/eye pose correctives and skinning to vertices in place."""
+        pose = self._pose
+        pose[JAW_JOINT] = jaw_pose if jaw_pose is not None else 0.0
+        pose[EYE_JOINTS[0]:EYE_JOINTS[1] + 1] = (
+            np.reshape(eye_pose, (2, 3)) if eye_pose is not None else 0.0
+        )
+        if not pose.any():
+            return vertices
+
+        rotations = batch_rodrigues(pose, self._joint_rotations)
+
+        # Pose correctives are added to the shaped mesh before skinning
+        feature = self._pose_feature.reshape(-1, 3, 3)
+        np.subtract(rotations[JAW_JOINT:], self._identity, out=feature)
+        np.dot(self._posedirs, self._pose_feature, out=self._pose_offsets)
+        flat = vertices.reshape(-1)
+        flat += self._pose_offsets
+
+        # Joint locations of the expression-shaped mesh
+        joints = self._joints
+        np.dot(self._joints_basis, expr, out=joints.reshape(-1))
+        joints += self._joints_template
+
+        # Kinematic chain, then remove the rest pose so G_k maps rest -> posed
+        transforms = self._joint_transforms
+        for k, parent in enumerate(self._parents):
+            if parent < 0:
+                transforms[k, :, :3] = rotations[k]
+                transforms[k, :, 3] = joints[k]
+            else:
+                parent_rotation = transforms[parent, :, :3]
+                transforms[k, :, :3] = parent_rotation @ rotations[k]
+                transforms[k, :, 3] = parent_rotation @ (joints[k] - joints[parent]) + transforms[parent, :, 3]
+        for k in range(len(transforms)):
+            transforms[k, :, 3] -= transforms[k, :, :3] @ joints[k]
+
+        # v' = v + sum_k w_k ((R_k - I) v + t_k) over the articulated joints;
+        # linear and offset parts are blended separately so every operand
+        # stays contiguous
+        first, last = ARTICULATED_JOINTS[0], ARTICULATED_JOINTS[-1] + 1
+        np.subtract(transforms[first:last, :, :3], self._identity,
+                    out=self._skin_joint_linear.reshape(-1, 3, 3), casting='unsafe')
+        self._skin_joint_offset[:] = transforms[first:last, :, 3]
+        np.dot(self._skin_weights, self._skin_joint_linear, out=self._skin_linear)
+        np.dot(self._skin_weights, self._skin_joint_offset, out=self._skin_offset)
+        np.take(flat, self._skin_flat_index, out=self._skin_vertices.reshape(-1), mode='clip')
+        np.einsum('nij,nj->ni', self._skin_linear.reshape(-1, 3, 3), self._skin_vertices, out=self._skinned)
+        self._skinned += self._skin_offset
+        self._skinned += self._skin_vertices
+        flat[self._skin_flat_index] = self._skinned.reshape(-1)
+        return vertices
+
+    def deform_mesh(self, flame_expr, jaw_pose=None, eye_pose=None, out=None):
+        """
+        Deform FLAME mesh using expression parameters, and articulate the jaw
+        (axis-angle, 3) and eyes (left then right axis-angle, 6) when given.
+
+        The result is written into `out` ((5023, 3) C-contiguous array of the
+        translator dtype) when given, otherwise into an internal buffer that
+        is overwritten by the next call.
+        """
+        if out is None:
+            out = self._vertices
+        np.copyto(self._expr_buf, flame_expr)
+        flat = out.reshape(-1)
+        np.dot(self._basis, self._expr_buf, out=flat)
+        flat += self._v_template_flat
+        if self.has_articulation and (jaw_pose is not None or eye_pose is not None):
+            self._articulate(out, self._expr_buf, jaw_pose, eye_pose)
+        return out
+
+    def init_low_rank(self, rank=None, max_error_mm=None):
+        """
+        Precompose the blendshape mapping with the expression basis.
+
+        Expressions produced by translate() lie in the span of the 52
+        blendshape mapping columns, so basis @ mapping is a (15069, 52)
+        matrix M. Its SVD truncated to k components gives a (15069, k)
+        vertex basis plus a (k, 100) map from expression coefficients,
+        making each deform_low_rank frame about k/100 of the deform_mesh
+        FLOPs. Expressions outside that span (e.g. after per-channel
+        filtering) are projected onto it.
+
+        Args:
+            rank: Number of components to keep (None = numerical rank of M,
+                at most 52, i.e. no truncation error)
+            max_error_mm: Instead of rank, keep the fewest components whose
+                worst-case vertex error stays within this budget
+
+        Returns:
+            (rank, max vertex error in mm): the error is a bound over all
+            blendshape score vectors in [0, 1]^52
+        """
+        if rank is not None and rank < 0:
+            raise ValueError(f"rank must be non-negative, got {rank}")
+        if max_error_mm is not None and max_error_mm <= 0:
+            raise ValueError(f"max_error_mm must be positive, got {max_error_mm}")
+        num_expr = self._basis.shape[1]
+        mapping = self._mapping[:, :num_expr].T
+        composed = np.asarray(self.expression_basis, dtype=np.float64) @ mapping
+        U, S, Vt = np.linalg.svd(composed, full_matrices=False)
+        numerical_rank = int((S > S[0] * 1e-10).sum()) if len(S) and S[0] > 0 else 0
+
+        def error_mm(k):
+            residual = (U[:, k:] * S[k:]) @ Vt[k:]
+            worst = np.maximum(np.clip(residual, 0, None).sum(axis=1),
+                               -np.clip(residual, None, 0).sum(axis=1))
+            return 1000 * float(np.sqrt((worst.reshape(-1, 3) ** 2).sum(axis=1)).max())
+
+        if max_error_mm is not None:
+            # Smallest k within budget; the error shrinks as k grows
+            low, high = 0, numerical_rank
+            while low < high:
+                middle = (low + high) // 2
+                if error_mm(middle) <= max_error_mm:
+                    high = middle
+                else:
+                    low = middle + 1
+            rank = low
+        elif rank is None:
+            rank = numerical_rank
+        rank = min(rank, numerical_rank)
+
+        self.low_rank = rank
+        self.low_rank_error_mm = error_mm(rank)
+        self._low_rank_basis = np.ascontiguousarray(U[:, :rank] * S[:rank], dtype=self.dtype)
+        self._low_rank_map = np.ascontiguousarray(Vt[:rank] @ np.linalg.pinv(mapping), dtype=self.dtype)
+        self._low_rank_coeffs = np.zeros(rank, dtype=self.dtype)
+        return self.low_rank, self.low_rank_error_mm
+
+    def deform_low_rank(self, flame_expr, jaw_pose=None, eye_pose=None, out=None):
+        """
+        Like deform_mesh, through the precomposed basis from init_low_rank
+        (called with its defaults on first use).
+        """
+        if self._low_rank_basis is None:
+            self.init_low_rank()
+        if out is None:
+            out = self._vertices
+        np.copyto(self._expr_buf, flame_expr)
+        np.dot(self._low_rank_map, self._expr_buf, out=self._low_rank_coeffs)
+        flat = out.reshape(-1)
+        np.dot(self._low_rank_basis, self._low_rank_coeffs, out=flat)
+        flat += self._v_template_flat
+        if self.has_articulation and (jaw_pose is not None or eye_pose is not None):
+            self._articulate(out, self._expr_buf, jaw_pose, eye_pose)
+        return out
+
+    def init_incremental(self, epsilon=1e-3, region_tolerance=None, dense_fraction=0.25,
+                         resync_every=1000):
+        """
+        Prepare the incremental deformation mode used by deform_incremental.
+
+        Args:
+            epsilon: Coefficient change below which a component is not updated;
+                the skipped change is carried over until it exceeds epsilon
+            region_tolerance: When set, each component only updates vertices
+                it displaces by more than this (model units, i.e. metres)
+                per unit coefficient, from a precomputed per-component index
+            dense_fraction: Above this fraction of changed components, a full
+                mat-vec is cheaper than the per-component updates
+            resync_every: Frames between full recomputes, bounding rounding
+                drift in the accumulated vertex state
+        """
+        num_expr = self._basis.shape[1]
+        self.incremental_epsilon = epsilon
+        self.region_tolerance = region_tolerance
+        self._dense_limit = max(1, int(dense_fraction * num_expr))
+        self._resync_every = resync_every
+
+        # One contiguous row per component, so a single-component update is
+        # one streaming axpy instead of a strided column walk
+        self._basis_columns = self._transposed_basis()
+        self._shaped = np.empty_like(self._v_template_flat)
+        self._applied_expr = np.zeros(num_expr, dtype=self.dtype)
+        self._expr_delta = np.zeros(num_expr, dtype=self.dtype)
+        self._expr_change = np.zeros(num_expr, dtype=self.dtype)
+        self._column_scratch = np.empty_like(self._v_template_flat)
+        self._frames_since_sync = None
+
+        self._region_index = None
+        if region_tolerance is not None:
+            num_vertices = self._vertices.shape[0]
+            displacement = np.linalg.norm(
+                np.asarray(self.expression_basis, dtype=np.float64).reshape(num_vertices, 3, num_expr), axis=1)
+            self._region_index = []
+            self._region_values = []
+            for component in range(num_expr):
+                vertices = np.nonzero(displacement[:, component] > region_tolerance)[0]
+                flat_index = (vertices[:, None] * 3 + np.arange(3)).ravel()
+                self._region_index.append(flat_index)
+                self._region_values.append(np.ascontiguousarray(self._basis_columns[component, flat_index]))
+            self._region_gather = np.empty_like(self._v_template_flat)
+
+    def _resync_incremental(self):
+        np.dot(self._basis, self._applied_expr, out=self._shaped)
+        self._shaped += self._v_template_flat
+        self._frames_since_sync = 0
+
+    def deform_incremental(self, flame_expr, jaw_pose=None, eye_pose=None, out=None):
+        """
+        Like deform_mesh, but only applies basis[:, changed] @ delta[changed]
+        to the kept vertex state for components that moved beyond epsilon.
+
+        On talking-head footage most components are nearly still from frame
+        to frame, so this touches a fraction of the basis. Call
+        init_incremental first to change the defaults.
+        """
+        if self._shaped is None:
+            self.init_incremental()
+        if out is None:
+            out = self._vertices
+
+        np.copyto(self._expr_buf, flame_expr)
+        if self._frames_since_sync is None or self._frames_since_sync >= self._resync_every:
+            np.copyto(self._applied_expr, self._expr_buf)
+            self._resync_incremental()
+        else:
+            self._frames_since_sync += 1
+            np.subtract(self._expr_buf, self._applied_expr, out=self._expr_delta)
+            np.abs(self._expr_delta, out=self._expr_change)
+            changed = np.flatnonzero(self._expr_change > self.incremental_epsilon)
+            if len(changed) > self._dense_limit:
+                self._applied_expr[changed] = self._expr_buf[changed]
+                self._resync_incremental()
+            elif self._region_index is None:
+                for component in changed:
+                    np.multiply(self._basis_columns[component], self._expr_delta[component],
+                                out=self._column_scratch)
+                    self._shaped += self._column_scratch
+                    self._applied_expr[component] = self._expr_buf[component]
+            else:
+                for component in changed:
+                    index = self._region_index[component]
+                    count = len(index)
+                    scratch = self._column_scratch[:count]
+                    gather = self._region_gather[:count]
+                    np.multiply(self._region_values[component], self._expr_delta[component], out=scratch)
+                    np.take(self._shaped, index, out=gather, mode='clip')
+                    gather += scratch
+                    self._shaped[index] = gather
+                    self._applied_expr[component] = self._expr_buf[component]
+
+        flat = out.reshape(-1)
+        np.copyto(flat, self._shaped)
+        if self.has_articulation and (jaw_pose is not None or eye_pose is not None):
+            self._articulate(out, self._applied_expr, jaw_pose, eye_pose)
+        return out
+
+    def transform_mesh(self, vertices, rotation, out=None, center=True):
+        """
+        Rotate vertices by a 3x3 matrix and optionally re-center them.
+
+        Computes vertices @ rotation.T in a single pass, then subtracts the
+        mean in place. `out` must not alias `vertices`; when omitted an
+        internal buffer is reused, as in deform_mesh.
         """
-        Deform FLAME mesh using expression parameters.
-        jaw_pose is optional and not yet implemented.
+        if out is None:
+            out = self._posed
+        np.copyto(self._rotation, rotation)
+        np.dot(vertices, self._rotation.T, out=out)
+        if center:
+            np.dot(self._mean_weights, out, out=self._centroid)
+            # Per-column scalar subtraction; broadcasting the (3,) centroid
+            # would go through a temporary ufunc buffer
+            for axis in range(3):
+                out[:, axis] -= self._centroid[axis]
+        return out
+
+    def _transposed_basis(self):
+        if self._basis_rows is None:
+            self._basis_rows = np.ascontiguousarray(self._basis.T)
+        return self._basis_rows
+
+    def deform_batch(self, expressions, jaw_poses=None, eye_poses=None, out=None, chunk_size=256):
+        """
+        Deform the mesh for a whole clip of expression parameters.
+
+        Frames are processed chunk_size at a time through one GEMM per chunk,
+        so the working memory stays at chunk_size meshes regardless of N.
+        The first float64 call keeps a transposed copy of the basis (12 MB),
+        which makes even two- or three-frame chunks cost well under two or
+        three single-frame deformations.
+
+        Args:
+            expressions: (N, 100) array of expression parameters
+            jaw_poses: Optional (N, 3) jaw axis-angle per frame
+            eye_poses: Optional (N, 6) eye axis-angles per frame
+            out: Optional (N, 5023, 3) destination, e.g. an np.memmap on disk
+            chunk_size: Frames per GEMM
+
+        Returns:
+            (N, 5023, 3) array of deformed vertices
+        """
+        num_frames = len(expressions)
+        num_vertices = self._vertices.shape[0]
+        if out is None:
+            out = np.empty((num_frames, num_vertices, 3), dtype=self.dtype)
+
+        # A plain C-contiguous output of the working dtype takes the GEMM
+        # directly; anything else (e.g. a float32 memmap) goes through scratch
+        direct = type(out) is np.ndarray and out.dtype == self.dtype and out.flags.c_contiguous
+        if direct:
+            out_flat = out.reshape(num_frames, -1)
+        else:
+            scratch = np.empty((min(chunk_size, num_frames), num_vertices * 3), dtype=self.dtype)
+        basis_rows = self._transposed_basis() if self.dtype == np.float64 else None
+        for start in range(0, num_frames, chunk_size):
+            stop = min(start + chunk_size, num_frames)
+            chunk = out_flat[start:stop] if direct else scratch[:stop - start]
+            if basis_rows is None and stop - start <= SMALL_BATCH:
+                # A few float32 rows (e.g. one per tracked face). Adding the
+                # template moves each column into its output row, so the
+                # transpose costs no extra pass (and no broadcast buffer)
+                rows = stop - start
+                width = rows if rows <= 2 else -(-rows // SGEMM_WIDTH) * SGEMM_WIDTH
+                padded = self._batch_expr[:width]
+                padded[:rows] = expressions[start:stop]
+                chunk_expr = padded[:rows]
+                columns = self._batch_columns[:chunk.shape[1] * width].reshape(-1, width)
+                np.dot(self._basis, padded.T, out=columns)
+                for i in range(rows):
+                    np.add(columns[:, i], self._v_template_flat, out=chunk[i])
+            else:
+                chunk_expr = np.asarray(expressions[start:stop], dtype=self.dtype)
+                np.dot(chunk_expr, self._basis.T if basis_rows is None else basis_rows, out=chunk)
+                # Row by row: a broadcast add over the chunk allocates a buffer
+                for i in range(stop - start):
+                    chunk[i] += self._v_template_flat
+            chunk_vertices = chunk.reshape(-1, num_vertices, 3)
+            if self.has_articulation and (jaw_poses is not None or eye_poses is not None):
+                for i in range(stop - start):
+                    self._articulate(chunk_vertices[i], chunk_expr[i],
+                                     None if jaw_poses is None else jaw_poses[start + i],
+                                     None if eye_poses is None else eye_poses[start + i])
+            if not direct:
+                out[start:stop] = chunk_vertices
+        return out
+
+    def transform_batch(self, vertices, rotations, out=None, center=True):
+        """
+        transform_mesh for N meshes: (N, V, 3) vertices, each rotated by its
+        own matrix from (N, 3, 3) rotations and optionally re-centered.
+
+        Each mesh goes through the allocation-free transform_mesh path; a
+        batched np.matmul over 3x3 matrices is slower than N BLAS calls.
         """
-        v_shaped = self.v_template + np.tensordot(self.expression_basis, flame_expr, axes=[2, 0])
-        return v_shaped
\ No newline at end of file
+        if out is None:
+            out = np.empty_like(vertices)
+        for i in range(len(vertices)):
+            self.transform_mesh(vertices[i], rotations[i], out=out[i], center=center)
+        return out
\ No newline at end of file
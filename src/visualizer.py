@@ -1,23 +1,126 @@
+import time
+
 import pyvista as pv
 import trimesh
 import numpy as np
+from vtkmodules.util.numpy_support import vtk_to_numpy
 
 class Visualizer:
-    def __init__(self, faces):
+    def __init__(self, faces, off_screen=False, num_meshes=1, spacing=0.25, max_fps=None, num_vertices=None):
+        """
+        Args:
+            faces: (F, 3) triangle indices of one mesh
+            off_screen: Render without a window (for screenshots/video export)
+            num_meshes: Number of avatars drawn side by side. They share one
+                merged PolyData and actor, so N avatars cost one render pass.
+            spacing: Horizontal distance between avatar centres
+            max_fps: Render at most this often; update_mesh calls in between
+                only refresh the vertex buffer, which render_pending() draws
+                once the interval has passed (None = render every update)
+            num_vertices: Vertices of one mesh, e.g. the template's vertex
+                count (default: highest index in faces + 1, which misses
+                trailing vertices no face uses)
+        """
+        faces = np.asarray(faces)
         self.faces = faces
-        self.plotter = pv.Plotter(off_screen=False)
+        self.off_screen = off_screen
+        self.num_meshes = num_meshes
+        self.num_vertices = num_vertices if num_vertices is not None else int(faces.max()) + 1
+        self.min_render_interval = 1.0 / max_fps if max_fps else 0.0
+        self.plotter = pv.Plotter(off_screen=off_screen)
         self.mesh_actor = None
-        
+        self._last_render = None
+        self._pending = False       # an update is buffered but not rendered yet
+
+        # Each avatar's vertices are shifted along x into its own place
+        self._offsets = np.zeros((num_meshes, 1, 3))
+        self._offsets[:, 0, 0] = (np.arange(num_meshes) - (num_meshes - 1) / 2) * spacing
+
+        # VTK cell layout [3, a, b, c] per triangle, for every avatar
+        num_faces = len(faces)
+        cells = np.empty((num_meshes, num_faces, 4), dtype=np.int64)
+        cells[:, :, 0] = 3
+        cells[:, :, 1:] = faces + (np.arange(num_meshes) * self.num_vertices)[:, None, None]
+
         # Add a placeholder so the window isn't empty (prevents white screen freeze)
-        pv_faces = np.hstack(np.c_[np.full(len(faces), 3), faces])
-        self.poly_data = pv.PolyData(np.zeros((5023, 3)), pv_faces)
+        self.poly_data = pv.PolyData(np.zeros((num_meshes * self.num_vertices, 3)), cells.ravel())
         self.mesh_actor = self.plotter.add_mesh(self.poly_data, color='cyan')
-        
+
+        # Zero-copy view of VTK's point array: frames are written in place
+        # and flagged with Modified() instead of replacing the array
+        self._vtk_points = self.poly_data.GetPoints()
+        self._points = vtk_to_numpy(self._vtk_points.GetData()).reshape(num_meshes, self.num_vertices, 3)
+
         # Position the camera: [x, y, z] position, [x, y, z] focus, [x, y, z] view-up
-        self.plotter.camera_position = [(0, 0, 1.2), (0, 0, 0), (0, 1, 0)]
-        self.plotter.show(interactive=False, auto_close=False)
+        # (pulled back so every avatar fits when there are several)
+        distance = 1.2 * max(1.0, 0.5 * num_meshes)
+        self.plotter.camera_position = [(0, 0, distance), (0, 0, 0), (0, 1, 0)]
+        if not off_screen:
+            self.plotter.show(interactive=False, auto_close=False)
+        self._image = None          # reused screenshot() output
 
-    def update_mesh(self, vertices):
-        self.poly_data.points = vertices
+    def update_mesh(self, vertices, active=None):
+        """
+        Show new vertices: (V, 3) for a single avatar, or (N, V, 3) for all
+        avatars. With `active` (N booleans), avatars marked False are hidden.
+
+        Returns True when the frame was rendered, False when it was only
+        buffered because of the max_fps cap (render_pending() draws it
+        later) or because rendering is off-screen, where screenshot()
+        renders on demand.
+        """
+        if self.num_meshes == 1:
+            np.copyto(self._points[0], vertices.reshape(self.num_vertices, 3))
+        else:
+            np.add(vertices, self._offsets, out=self._points)
+        if active is not None:
+            for slot in np.flatnonzero(~np.asarray(active)):
+                # Collapsed to a point, the avatar draws nothing
+                self._points[slot] = 0.0
+        self._vtk_points.Modified()
+
+        # Off-screen plotters render on demand in screenshot()
+        if self.off_screen:
+            return False
+        return self._render_when_due()
+
+    def render_pending(self):
+        """
+        Render the last update if the max_fps cap held it back and the
+        interval has passed since. Drive loops call this every iteration,
+        so the final pose before the face stops changing (or is lost) still
+        reaches the screen. Returns True when a frame was rendered.
+        """
+        if not self._pending:
+            return False
+        return self._render_when_due()
+
+    def _render_when_due(self):
+        now = time.perf_counter()
+        if self._last_render is not None and now - self._last_render < self.min_render_interval:
+            self._pending = True
+            return False
+        self._last_render = now
+        self._pending = False
         # This keeps the camera from "jumping" while the face moves
-        self.plotter.render()
\ No newline at end of file
+        self.plotter.render()
+        return True
+
+    def screenshot(self, out=None):
+        """
+        Render the current mesh and return it as an (H, W, 3) RGB uint8 image.
+
+        The image is written into `out` when given, otherwise into an
+        internal buffer that is overwritten by the next call.
+        """
+        # render() draws the latest update; an off-screen plotter's first
+        # frame is set up and drawn by screenshot() itself
+        self.plotter.render()
+        pixels = self.plotter.screenshot(transparent_background=False, return_img=True)
+        height, width = pixels.shape[:2]
+        if out is None:
+            if self._image is None or self._image.shape[:2] != (height, width):
+                self._image = np.empty((height, width, 3), dtype=np.uint8)
+            out = self._image
+        np.copyto(out, pixels)
+        return out
@@ -0,0 +1,22 @@
+import numpy as np
+import pytest
+
+from benchmark import synthetic_model
+from translator import FlameTranslator
+
+
+@pytest.fixture(scope='module')
+def model():
+    return synthetic_model()
+
+
+@pytest.mark.parametrize('dtype, tolerance', [(np.float64, 1e-9), (np.float32, 1e-4)])
+def test_batch_matches_single_frame_deformation(model, dtype, tolerance):
+    translator = FlameTranslator(model, mappings_path=None, dtype=dtype)
+    rng = np.random.default_rng(0)
+    # Chunks of every kernel: one row, padded small chunks and full GEMMs
+    for num_frames in (1, 2, 4, 3, 5, 17, 40):
+        expressions = rng.standard_normal((num_frames, 100)) * 0.5
+        vertices = translator.deform_batch(expressions, chunk_size=32)
+        for i, expression in enumerate(expressions):
+            np.testing.assert_allclose(vertices[i], translator.deform_mesh(expression), atol=tolerance)
@@ -0,0 +1,53 @@
+import types
+
+import numpy as np
+
+from benchmark import SyntheticCapture, synthetic_blendshapes, synthetic_landmarks, synthetic_model
+from exporter import ParameterExporter
+from main import export_video
+from translator import FlameTranslator
+
+NUM_FRAMES = 12
+NO_FACE = (4, 5, 9)
+
+
+class ScriptedDetector:
+    """VIDEO-mode landmarker stand-in replaying synthetic tracking results."""
+
+    def __init__(self, num_frames):
+        self.blendshapes = synthetic_blendshapes(num_frames)
+        self.landmarks = synthetic_landmarks(num_frames)
+        self.calls = 0
+
+    def detect_for_video(self, image, timestamp_ms):
+        index = self.calls
+        self.calls += 1
+        if index in NO_FACE:
+            return types.SimpleNamespace(face_blendshapes=[], face_landmarks=[])
+        return types.SimpleNamespace(face_blendshapes=[self.blendshapes[index]],
+                                     face_landmarks=[self.landmarks[index]])
+
+
+def test_export_video_deforms_every_valid_frame(tmp_path):
+    translator = FlameTranslator(synthetic_model(), mappings_path=None)
+    output = str(tmp_path / 'export')
+    with ParameterExporter(output, save_vertices=True,
+                           num_vertices=translator.v_template.shape[0]) as exporter:
+        frame_count = export_video(SyntheticCapture(64, 48), ScriptedDetector(NUM_FRAMES), translator,
+                                   exporter, fps=30.0, num_frames=NUM_FRAMES, progress_every=0)
+    assert frame_count == NUM_FRAMES
+
+    valid = np.load(f'{output}/valid.npy')
+    vertices = np.load(f'{output}/vertices.npy')
+    head_pose = np.load(f'{output}/head_pose.npy')
+    assert list(np.flatnonzero(~valid)) == list(NO_FACE)
+
+    for frame in range(1, NUM_FRAMES):
+        if valid[frame] and valid[frame - 1]:
+            # A new face moves the mesh and the pose
+            assert not np.allclose(vertices[frame], vertices[frame - 1])
+            assert not np.allclose(head_pose[frame], head_pose[frame - 1])
+        elif not valid[frame]:
+            # Frames without a face repeat the previous result
+            np.testing.assert_array_equal(vertices[frame], vertices[frame - 1])
+            np.testing.assert_array_equal(head_pose[frame], head_pose[frame - 1])
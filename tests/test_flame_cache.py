@@ -0,0 +1,41 @@
+import os
+import pickle
+
+import numpy as np
+
+from flame_cache import build_cache, load_flame_model
+
+
+def write_model(path, seed):
+    rng = np.random.default_rng(seed)
+    num_vertices = 20
+    model = {
+        'v_template': rng.standard_normal((num_vertices, 3)),
+        'shapedirs': rng.standard_normal((num_vertices, 3, 400)),
+        'f': rng.integers(0, num_vertices, size=(30, 3)),
+        'J_regressor': rng.random((5, num_vertices)),
+        'kintree_table': np.array([[-1, 0, 1, 1, 1], [0, 1, 2, 3, 4]]),
+        'weights': rng.random((num_vertices, 5)),
+        'posedirs': rng.standard_normal((num_vertices, 3, 36)),
+    }
+    with open(path, 'wb') as f:
+        pickle.dump(model, f)
+    return model
+
+
+def test_rebuild_leaves_mapped_arrays_intact(tmp_path):
+    model_path = str(tmp_path / 'generic_model.pkl')
+    first = write_model(model_path, seed=0)
+    mapped = load_flame_model(model_path)['expression_basis']
+    expected = first['shapedirs'][:, :, 300:400].reshape(-1, 100).astype(np.float32)
+    np.testing.assert_array_equal(mapped, expected)
+
+    # A new model rebuilds the cache while `mapped` is still in use
+    second = write_model(model_path, seed=1)
+    cache_dir = build_cache(model_path)
+    np.testing.assert_array_equal(mapped, expected)
+
+    rebuilt = load_flame_model(model_path)['expression_basis']
+    np.testing.assert_array_equal(rebuilt, second['shapedirs'][:, :, 300:400].reshape(-1, 100).astype(np.float32))
+    # Only the cache files are left behind, no temporaries
+    assert all(not name.startswith('.') for name in os.listdir(cache_dir))
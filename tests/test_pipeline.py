@@ -0,0 +1,21 @@
+import pytest
+
+from pipeline import BufferPool, FrameQueue
+
+
+def test_drop_oldest_returns_dropped_buffers_to_the_pool():
+    pool = BufferPool(['a', 'b', 'c'])
+    queue = FrameQueue(maxsize=1, policy='drop_oldest', on_drop=pool.release)
+    queue.put(pool.acquire())
+    queue.put(pool.acquire())
+    assert queue.dropped == 1
+    # The consumer still reads 'b'; 'a' came back and is handed out again
+    assert queue.get() == 'b'
+    assert [pool.acquire(), pool.acquire()] == ['c', 'a']
+
+
+def test_exhausted_pool_raises():
+    pool = BufferPool([None])
+    pool.acquire()
+    with pytest.raises(RuntimeError):
+        pool.acquire()
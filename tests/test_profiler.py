@@ -0,0 +1,24 @@
+import csv
+
+from profiler import Profiler, open_sink
+
+
+def test_csv_log_keeps_spans_first_seen_after_the_first_frame(tmp_path):
+    path = str(tmp_path / 'timings.csv')
+    profiler = Profiler(source_fps=30.0, sink=open_sink(path))
+    for frame in range(3):
+        with profiler.span('detect'):
+            pass
+        # No face in the first frame, so nothing is deformed
+        if frame > 0:
+            with profiler.span('deform'):
+                pass
+        profiler.end_frame()
+    profiler.close()
+
+    with open(path, newline='') as f:
+        rows = list(csv.DictReader(f))
+    assert [row['frame'] for row in rows] == ['1', '2', '3']
+    assert 'deform' in rows[0]
+    assert rows[0]['deform'] == ''
+    assert all(float(row['deform']) >= 0 for row in rows[1:])
@@ -0,0 +1,22 @@
+import numpy as np
+
+from recording import Recording, RecordingWriter, metadata_path
+
+
+def test_aspect_ratio_is_stored_next_to_the_recording(tmp_path):
+    path = str(tmp_path / 'session.rec.npy')
+    with RecordingWriter(path, aspect_ratio=16 / 9) as recorder:
+        recorder.write(0, True, landmarks=np.full((478, 3), 0.5))
+        recorder.write(33, False)
+    assert metadata_path(path) == str(tmp_path / 'session.rec.json')
+
+    recording = Recording(path)
+    assert len(recording) == 2
+    assert recording.aspect_ratio == 16 / 9
+
+
+def test_recording_without_metadata_has_no_aspect_ratio(tmp_path):
+    path = str(tmp_path / 'old.rec.npy')
+    with RecordingWriter(path) as recorder:
+        recorder.write(0, False)
+    assert Recording(path).aspect_ratio is None
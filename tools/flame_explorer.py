@@ -1,14 +1,17 @@
-import pickle
+import os
+import sys
 import numpy as np
 import pyvista as pv
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from flame_cache import load_flame_model
+
 class FlameExpressionExplorer:
     def __init__(self, model_path):
-        with open(model_path, 'rb') as f:
-            self.model = pickle.load(f, encoding='latin1')
+        self.model = load_flame_model(model_path)
         
         self.v_template = self.model['v_template']
-        self.expression_basis = self.model['shapedirs'][:, :, 300:400]
+        self.expression_basis = self.model['expression_basis']
         self.faces = self.model['f']
         
     def visualize_expression(self, expr_index, intensity=3.0):
@@ -21,7 +24,7 @@ class FlameExpressionExplorer:
         flame_expr[expr_index] = intensity
         
         # Deform mesh
-        v_shaped = self.v_template + np.tensordot(self.expression_basis, flame_expr, axes=[2, 0])
+        v_shaped = self.v_template + (self.expression_basis @ flame_expr).reshape(-1, 3)
         
         # Create PyVista mesh
         pv_faces = np.hstack(np.c_[np.full(len(self.faces), 3), self.faces])
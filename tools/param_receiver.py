@@ -0,0 +1,114 @@
+"""
+Reference receiver for `main.py --stream`: decodes FLAME parameter packets
+from UDP and drives one avatar per avatar id.
+
+    python tools/param_receiver.py --port 9870 --num-avatars 1
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from head_pose import head_rotation
+from param_stream import DEFAULT_PORT, ParameterReceiver
+from translator import FlameTranslator
+
+FLAME_PATH = 'model/generic_model.pkl'
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Render FLAME avatars from a parameter stream.")
+    parser.add_argument('--host', default='0.0.0.0', help="Address to listen on")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help="UDP port to listen on")
+    parser.add_argument('--flame', default=FLAME_PATH, help="FLAME generic_model.pkl")
+    parser.add_argument('--num-avatars', type=int, default=1,
+                        help="Avatars drawn side by side; packets for higher ids are ignored")
+    parser.add_argument('--render-fps', type=float, metavar='FPS', help="Cap avatar rendering at this rate")
+    parser.add_argument('--no-render', action='store_true',
+                        help="Only decode and deform, without a window (e.g. to measure the stream)")
+    parser.add_argument('--idle-timeout', type=float, default=None, metavar='SECONDS',
+                        help="Exit after this long without packets (default: run until Ctrl+C)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    translator = FlameTranslator(args.flame, mappings_path=None)
+    num_avatars = args.num_avatars
+    num_vertices = translator.v_template.shape[0]
+
+    visualizer = None
+    if not args.no_render:
+        from visualizer import Visualizer
+        visualizer = Visualizer(translator.faces, num_meshes=num_avatars, max_fps=args.render_fps,
+                                num_vertices=num_vertices)
+
+    # Per-avatar state, reused every packet
+    posed_vertices = np.zeros((num_avatars, num_vertices, 3), dtype=translator.dtype)
+    active = np.zeros(num_avatars, dtype=bool)
+    rotation = np.empty((3, 3))
+
+    receiver = ParameterReceiver((args.host, args.port))
+    host, port = receiver.address
+    print(f"Listening on {host}:{port} for {num_avatars} avatar(s)")
+    print("Press Ctrl+C to quit\n")
+
+    # Wake up at least once per render interval, so an update held back by
+    # --render-fps is drawn even when no further packet arrives
+    poll_timeout = min(0.5, 1.0 / args.render_fps) if args.render_fps else 0.5
+
+    applied = 0
+    # Rates are measured from the first packet on
+    start_time = None
+    last_packet = time.perf_counter()
+    try:
+        while True:
+            frame = receiver.receive(timeout=poll_timeout)
+            now = time.perf_counter()
+            if visualizer is not None:
+                visualizer.render_pending()
+            if frame is None:
+                if args.idle_timeout is not None and now - last_packet > args.idle_timeout:
+                    break
+                continue
+            last_packet = now
+            if start_time is None:
+                start_time = now
+            if frame.avatar >= num_avatars:
+                continue
+
+            # Invalid frames (face lost) keep the avatar's last pose
+            if frame.valid:
+                deformed = translator.deform_mesh(frame.expression, frame.jaw_pose, frame.eye_pose)
+                head_rotation(frame.head_pose, rotation)
+                translator.transform_mesh(deformed, rotation, out=posed_vertices[frame.avatar])
+                active[frame.avatar] = True
+                applied += 1
+                if visualizer is not None:
+                    if num_avatars == 1:
+                        visualizer.update_mesh(posed_vertices[0])
+                    else:
+                        visualizer.update_mesh(posed_vertices, active=active)
+
+            if applied and applied % 300 == 0 and frame.valid:
+                elapsed = now - start_time
+                print(f"{applied} frames, {receiver.bytes_received / elapsed / 1024:.1f} KB/s, "
+                      "{received} received, {lost} lost, {stale} stale, {undecodable} undecodable"
+                      .format(**receiver.decoder.stats()))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        receiver.close()
+
+    elapsed = last_packet - start_time if start_time is not None else 0.0
+    rate = receiver.bytes_received / elapsed / 1024 if elapsed > 0 else 0.0
+    print(f"\n=== Received {applied} frames, {receiver.bytes_received} bytes ({rate:.1f} KB/s) ===")
+    print("{received} received, {lost} lost, {stale} stale, {undecodable} undecodable"
+          .format(**receiver.decoder.stats()))
+
+
+if __name__ == '__main__':
+    main()
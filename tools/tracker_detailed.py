@@ -1,13 +1,21 @@
+import os
+import sys
+
 import cv2
 import mediapipe as mp
 from mediapipe.tasks import python
 from mediapipe.tasks.python import vision
 from mediapipe import Image
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from live_stream import LiveStreamDetector
+
 # CONFIGS
 MODEL_PATH = 'face_landmarker.task'
 VIDEO_PATH = 'example.mov'
 USE_WEBCAM = False
+# Detect asynchronously and keep the window responsive (webcam only)
+USE_LIVE_STREAM = USE_WEBCAM
 
 def run_face_processor():
     base_options = python.BaseOptions(model_asset_path=MODEL_PATH)
@@ -17,10 +25,13 @@ def run_face_processor():
         running_mode=vision.RunningMode.VIDEO
     )
 
-    detector = vision.FaceLandmarker.create_from_options(options)
+    if USE_LIVE_STREAM:
+        detector = LiveStreamDetector(MODEL_PATH)
+    else:
+        detector = vision.FaceLandmarker.create_from_options(options)
 
     cap = cv2.VideoCapture(0 if USE_WEBCAM else VIDEO_PATH)
-    fps = cap.get(cv2.CAP_PROP_FPS)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
 
     frame_count = 0
     while cap.isOpened():
@@ -35,9 +46,15 @@ def run_face_processor():
         timestamp = int(frame_count * (1000 / fps))
         frame_count += 1
 
-        detection_result = detector.detect_for_video(mp_image, timestamp)
+        if USE_LIVE_STREAM:
+            # Show the newest finished detection; busy frames are dropped
+            detector.submit(mp_image, timestamp)
+            latest = detector.latest()
+            detection_result = latest[1] if latest is not None else None
+        else:
+            detection_result = detector.detect_for_video(mp_image, timestamp)
 
-        if detection_result.face_blendshapes and frame_count % 30 == 0:
+        if detection_result and detection_result.face_blendshapes and frame_count % 30 == 0:
             print(f"\n=== FRAME {frame_count} - Active Blendshapes (score > 0.1) ===")
             scores = detection_result.face_blendshapes[0]
             
@@ -53,7 +70,10 @@ def run_face_processor():
             break
 
     cap.release()
+    detector.close()
     cv2.destroyAllWindows()
+    if USE_LIVE_STREAM:
+        print(f"Frames dropped while detection was busy: {detector.dropped}")
 
 if __name__ == "__main__":
     run_face_processor()
\ No newline at end of file